@@ -0,0 +1,122 @@
+import argparse
+import json
+import multiprocessing
+import time
+from collections import deque
+
+from board_and_pieces import Bishop, Board, Colour, King, Knight, Pawn, Queen, Rook
+from perft import perft
+
+GRID_PIECES = {"p": Pawn, "n": Knight, "b": Bishop, "r": Rook, "q": Queen, "k": King}
+
+
+def board_from_rows(rows) -> Board:
+    # eight rows in the testing_boards format, "-" for an empty square, white to move
+    board_dict = {}
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row.split()):
+            if char == "-":
+                continue
+            colour = Colour.WHITE if char.isupper() else Colour.BLACK
+            piece = GRID_PIECES[char.lower()](x, y, colour)
+            # pawns off their starting rank can't push two squares
+            if isinstance(piece, Pawn):
+                piece.has_moved = y != (6 if colour == Colour.WHITE else 1)
+            board_dict[(x, y)] = piece
+    return Board(board_dict)
+
+
+def read_positions(lines):
+    # yields one position per FEN line or per eight-row board, as the text it was read from; blank lines and
+    # lines starting with # are skipped
+    rows = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "/" in line:
+            yield line
+        else:
+            rows.append(line)
+            if len(rows) == 8:
+                yield "\n".join(rows)
+                rows = []
+    if rows:
+        yield "\n".join(rows)
+
+
+def parse_position(text: str) -> Board:
+    if "/" in text:
+        return Board.from_fen(text)
+    rows = text.split("\n")
+    if len(rows) != 8:
+        raise ValueError("expected 8 rows, got %d" % len(rows))
+    return board_from_rows(rows)
+
+
+def analyse(text: str, depth: int) -> dict:
+    result = {"position": text}
+    try:
+        board = parse_position(text)
+        colour = board.turn
+        result["turn"] = colour.name.lower()
+        result["status"] = board.game_status(colour).name.lower()
+        result["legal_moves"] = board.legal_moves(colour)
+        result["perft"] = [perft(board, d) for d in range(1, depth + 1)]
+    except (KeyError, ValueError, IndexError, AttributeError) as error:
+        # one bad position shouldn't stop the rest of the batch
+        result["error"] = "%s: %s" % (type(error).__name__, error)
+    return result
+
+
+def analyse_chunk(chunk: list, depth: int) -> list:
+    # positions travel to and from the workers a chunk at a time, and come back as lines ready to write
+    return [json.dumps(analyse(text, depth)) for text in chunk]
+
+
+def chunked(positions, chunk_size: int):
+    chunk = []
+    for text in positions:
+        chunk.append(text)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(positions, out, depth=2, processes=None, chunk_size=64) -> int:
+    # analyses positions on every core and writes one JSON line per position to out, in input order. At most
+    # two chunks per process are in flight at a time, so memory stays the same however long the input is.
+    processes = processes or multiprocessing.cpu_count()
+    count = 0
+    with multiprocessing.Pool(processes) as pool:
+        pending = deque()
+        for chunk in chunked(positions, chunk_size):
+            pending.append(pool.apply_async(analyse_chunk, (chunk, depth)))
+            if len(pending) >= 2 * processes:
+                for line in pending.popleft().get():
+                    out.write(line + "\n")
+                    count += 1
+        while pending:
+            for line in pending.popleft().get():
+                out.write(line + "\n")
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Work out legal moves, game status and perft counts for a file of positions.")
+    parser.add_argument("input", help="FEN lines, or boards in the testing_boards format")
+    parser.add_argument("output", help="file to write one JSON line per position to")
+    parser.add_argument("--depth", type=int, default=2, help="perft depth to count to")
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="positions sent to a worker at a time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.input) as positions, open(args.output, "w") as out:
+        count = run(read_positions(positions), out, args.depth, args.processes, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print("%d positions in %.3fs, %.0f positions/s" % (count, elapsed, count / elapsed if elapsed else 0))
@@ -0,0 +1,39 @@
+import io
+import json
+
+from batch import analyse, parse_position, read_positions, run
+from board_and_pieces import Colour
+from perft import POSITIONS
+
+
+def test_read_positions():
+    lines = open("./testing_boards/board6.txt").read().split("\n")
+    text = "\n".join(["# a comment", POSITIONS["start"][0], ""] + lines + [POSITIONS["kiwipete"][0]])
+    positions = list(read_positions(io.StringIO(text)))
+    assert len(positions) == 3
+    assert positions[0] == POSITIONS["start"][0]
+    assert positions[1].split("\n")[1].split()[5] == "k"
+    board = parse_position(positions[1])
+    assert board.squares[0 + 8 * 3].kind == 0 and board.squares[0 + 8 * 3].colour == Colour.WHITE
+    assert positions[2] == POSITIONS["kiwipete"][0]
+
+
+def test_analyse():
+    result = analyse(POSITIONS["kiwipete"][0], 2)
+    assert result["turn"] == "white"
+    assert result["status"] == "ongoing"
+    assert len(result["legal_moves"]) == 48
+    assert result["perft"] == POSITIONS["kiwipete"][1][:2]
+    assert analyse("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3", 1)["status"] == "checkmate"
+    assert "error" in analyse("not a position", 1)
+
+
+def test_run_keeps_input_order():
+    positions = [POSITIONS[name][0] for name in ["start", "kiwipete", "position3", "position4", "position5"]] * 3
+    out = io.StringIO()
+    assert run(iter(positions), out, depth=2, processes=2, chunk_size=2) == len(positions)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [result["position"] for result in results] == positions
+    for result in results:
+        assert result["perft"] == next(expected[:2] for fen, expected in POSITIONS.values()
+                                       if fen == result["position"])
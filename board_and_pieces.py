@@ -1,4 +1,9 @@
+import random
+from array import array
 from enum import Enum
+from typing import NamedTuple
+
+from move_cache import LegalMoveCache
 
 
 class Colour(Enum):
@@ -6,7 +11,319 @@ class Colour(Enum):
     BLACK = 2
 
 
+class GameStatus(Enum):
+    ONGOING = 1
+    CHECKMATE = 2
+    STALEMATE = 3
+    THREEFOLD_REPETITION = 4
+    FIVEFOLD_REPETITION = 5
+    FIFTY_MOVE_RULE = 6
+    INSUFFICIENT_MATERIAL = 7
+
+
+DRAWS = (GameStatus.STALEMATE, GameStatus.THREEFOLD_REPETITION, GameStatus.FIVEFOLD_REPETITION,
+         GameStatus.FIFTY_MOVE_RULE, GameStatus.INSUFFICIENT_MATERIAL)
+
+
+# Bitboards use bit x + 8*y for square (x, y), so bit 0 is (0, 0) and bit 63 is (7, 7).
+FULL_BOARD = (1 << 64) - 1
+SQUARES = [(i % 8, i // 8) for i in range(64)]
+# the first four directions increase the square index, the last four decrease it
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (-1, 1), (-1, 0), (0, -1), (-1, -1), (1, -1)]
+ORTHOGONAL = (0, 1, 4, 5)
+DIAGONAL = (2, 3, 6, 7)
+KNIGHT_OFFSETS = [(1, -2), (2, -1), (2, 1), (1, 2), (-1, -2), (-2, -1), (-1, 2), (-2, 1)]
+KING_OFFSETS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+def _offset_squares(offsets):
+    # for each square, the bit indices of the squares the offsets reach without leaving the board, in offset order
+    table = []
+    for x, y in SQUARES:
+        table.append(tuple(x + x_inc + 8 * (y + y_inc) for x_inc, y_inc in offsets
+                           if 0 <= x + x_inc < 8 and 0 <= y + y_inc < 8))
+    return table
+
+
+def _ray_squares(x_inc, y_inc):
+    # for each square, the bit indices along the ray, nearest first
+    table = []
+    for x, y in SQUARES:
+        ray = []
+        for i in range(1, 8):
+            if not (0 <= x + x_inc*i < 8 and 0 <= y + y_inc*i < 8):
+                break
+            ray.append(x + x_inc*i + 8 * (y + y_inc*i))
+        table.append(tuple(ray))
+    return table
+
+
+def _masks(table):
+    return [sum(1 << index for index in indices) for indices in table]
+
+
+# the move generators walk these square tables; the bitboard masks are built from the same tables
+KNIGHT_SQUARES = _offset_squares(KNIGHT_OFFSETS)
+KING_SQUARES = _offset_squares(KING_OFFSETS)
+RAY_SQUARES = [_ray_squares(x_inc, y_inc) for x_inc, y_inc in DIRECTIONS]
+# indexed by Colour.value; white pawns move towards y = 0, black pawns towards y = 7
+PAWN_PUSH_SQUARES = [None, _offset_squares([(0, -1)]), _offset_squares([(0, 1)])]
+PAWN_CAPTURE_SQUARES = [None, _offset_squares([(1, -1), (-1, -1)]),
+                        _offset_squares([(1, 1), (-1, 1)])]
+KNIGHT_ATTACKS = _masks(KNIGHT_SQUARES)
+KING_ATTACKS = _masks(KING_SQUARES)
+PAWN_ATTACKS = [None, _masks(PAWN_CAPTURE_SQUARES[1]),
+                _masks(PAWN_CAPTURE_SQUARES[2])]
+RAYS = [_masks(table) for table in RAY_SQUARES]
+RANK_MASKS = [0xFF << (8 * y) for y in range(8)]
+NOT_FILE_MASKS = [FULL_BOARD ^ (0x0101010101010101 << x) for x in range(8)]
+DARK_SQUARES = sum(1 << index for index, (x, y) in enumerate(SQUARES) if (x + y) % 2)
+
+# castling rights, KQkq
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+# rights that survive a move from or to each square: moving or capturing a king or rook on its
+# starting square gives up the castles it was part of
+CASTLING_MASKS = [15] * 64
+CASTLING_MASKS[0] = 15 ^ BLACK_QUEENSIDE
+CASTLING_MASKS[4] = 15 ^ BLACK_QUEENSIDE ^ BLACK_KINGSIDE
+CASTLING_MASKS[7] = 15 ^ BLACK_KINGSIDE
+CASTLING_MASKS[56] = 15 ^ WHITE_QUEENSIDE
+CASTLING_MASKS[60] = 15 ^ WHITE_QUEENSIDE ^ WHITE_KINGSIDE
+CASTLING_MASKS[63] = 15 ^ WHITE_KINGSIDE
+# each right with the bit index and PieceType.index of the king and rook it needs
+CASTLING_PIECES = [(WHITE_KINGSIDE, 60, 5, 63, 3), (WHITE_QUEENSIDE, 60, 5, 56, 3),
+                   (BLACK_KINGSIDE, 4, 11, 7, 9), (BLACK_QUEENSIDE, 4, 11, 0, 9)]
+
+# Zobrist keys: a position's key is the xor of one random number per piece on its square, plus the side to
+# move, castling rights and en passant file. A fixed seed keeps keys stable between runs.
+_zobrist_random = random.Random(20210705)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for square in range(64)]
+                  for index in range(12)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for rights in range(16)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for x in range(8)]
+
+# Evaluation: material plus a bonus for each piece on each square, in centipawns, with a middlegame and an
+# endgame value for each. Tables are laid out from white's side as the board prints, rank 8 first, so a white
+# piece on bit index i scores table[i] and a black one scores table[i ^ 56].
+MATERIAL_MG = [82, 337, 365, 477, 1025, 0]
+MATERIAL_EG = [94, 281, 297, 512, 936, 0]
+PAWN_TABLE_MG = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0]
+PAWN_TABLE_EG = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0]
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+ROOK_TABLE = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0]
+QUEEN_TABLE = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20]
+KING_TABLE_MG = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20]
+KING_TABLE_EG = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50]
+# how much each piece kind counts towards the middlegame; a full set of pieces is MAX_PHASE and no pieces but
+# kings and pawns is a pure endgame
+PHASE_WEIGHTS = [0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+
+def _score_tables(material, tables):
+    # signed scores indexed by PieceType.index and bit index: positive for white, negative for black
+    white = [[material[kind] + table[index] for index in range(64)] for kind, table in enumerate(tables)]
+    black = [[-row[index ^ 56] for index in range(64)] for row in white]
+    return white + black
+
+
+SCORES_MG = _score_tables(MATERIAL_MG, [PAWN_TABLE_MG, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE,
+                                        KING_TABLE_MG])
+SCORES_EG = _score_tables(MATERIAL_EG, [PAWN_TABLE_EG, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE,
+                                        KING_TABLE_EG])
+PHASES = PHASE_WEIGHTS * 2
+
+
+def sliding_attacks(square: int, occupied: int, directions) -> int:
+    # walk each ray up to and including its first blocker
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            if direction < 4:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[direction][first]
+        attacks |= ray
+    return attacks
+
+
+def _blocker_mask(square: int, directions) -> int:
+    # the squares whose occupancy can change a slider's attacks; the last square of each ray never can
+    mask = 0
+    for direction in directions:
+        ray = RAYS[direction][square]
+        if ray:
+            mask |= ray ^ (1 << (ray.bit_length() - 1)
+                           if direction < 4 else ray & -ray)
+    return mask
+
+
+def _between():
+    # the squares strictly between two squares on a line, indexed by a << 6 | b; 0 when they don't share one
+    table = [0] * 4096
+    for square in range(64):
+        for rays in RAY_SQUARES:
+            between = 0
+            for other in rays[square]:
+                table[square << 6 | other] = between
+                between |= 1 << other
+    return table
+
+
+BETWEEN = _between()
+BISHOP_MASKS = [_blocker_mask(square, DIAGONAL) for square in range(64)]
+ROOK_MASKS = [_blocker_mask(square, ORTHOGONAL) for square in range(64)]
+# sliding attacks are looked up by (relevant blockers, square) and filled in on first use
+_BISHOP_ATTACKS = {}
+_ROOK_ATTACKS = {}
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    key = (occupied & BISHOP_MASKS[square]) << 6 | square
+    attacks = _BISHOP_ATTACKS.get(key)
+    if attacks is None:
+        attacks = _BISHOP_ATTACKS[key] = sliding_attacks(
+            square, occupied, DIAGONAL)
+    return attacks
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    key = (occupied & ROOK_MASKS[square]) << 6 | square
+    attacks = _ROOK_ATTACKS.get(key)
+    if attacks is None:
+        attacks = _ROOK_ATTACKS[key] = sliding_attacks(
+            square, occupied, ORTHOGONAL)
+    return attacks
+
+
+# move lists are shared between positions: (piece_location, move_location) pairs keyed by (targets, square) for
+# pieces, and for pawns by (targets on one rank, rank, distance) a rank at a time, so at most one entry for each
+# 8 bit rank mask. A piece's targets take in check and pin masks as well, too many to key by rank without slowing
+# move generation down, so that memo is emptied once it holds MAX_MEMO_ENTRIES lists.
+MAX_MEMO_ENTRIES = 1 << 16
+_TARGET_MOVES = {}
+_PUSH_MOVES = {}
+
+
+def target_moves(square: int, targets: int) -> tuple:
+    key = targets << 6 | square
+    moves = _TARGET_MOVES.get(key)
+    if moves is None:
+        if len(_TARGET_MOVES) >= MAX_MEMO_ENTRIES:
+            _TARGET_MOVES.clear()
+        origin = SQUARES[square]
+        found = []
+        while targets:
+            low = targets & -targets
+            found.append((origin, SQUARES[low.bit_length() - 1]))
+            targets ^= low
+        moves = _TARGET_MOVES[key] = tuple(found)
+    return moves
+
+
+def push_moves(targets: int, distance: int) -> tuple:
+    # pawn moves to every square in targets from distance squares (in bit index) behind it, with one move per
+    # piece for pawns reaching the last rank
+    moves = ()
+    while targets:
+        shift = (targets & -targets).bit_length() - 1 & 56
+        row = targets >> shift & 255
+        targets ^= row << shift
+        key = (row << 6 | shift) << 6 | (distance + 16)
+        found = _PUSH_MOVES.get(key)
+        if found is None:
+            found = []
+            for square in range(shift, shift + 8):
+                if not row >> (square - shift) & 1:
+                    continue
+                if square < 8 or square >= 56:
+                    x, y = SQUARES[square]
+                    found += [(SQUARES[square + distance], (x, y, piece)) for piece in PROMOTION_PIECES]
+                else:
+                    found.append((SQUARES[square + distance], SQUARES[square]))
+            found = _PUSH_MOVES[key] = tuple(found)
+        moves += found
+    return moves
+
+
 class Piece:
+    # Piece objects are what Board.board_dict hands out and what a Board can be built from; the board itself
+    # keeps a shared PieceType per square and the moved flags as a bitmask
+    __slots__ = ("x", "y", "colour", "has_moved", "letter")
+    kind = None
+
     def __init__(self, x: int, y: int, colour: Enum, has_moved=False) -> None:
         self.x = x
         self.y = y
@@ -16,99 +333,100 @@ class Piece:
     def on_board(self, pos: tuple) -> bool:
         return 0 <= pos[0] < 8 and 0 <= pos[1] < 8
 
-    def increment(self, increment_lst, board):
+    def increment(self, directions, board):
+        # walk each ray (an index into DIRECTIONS) up to the first piece, which can be taken if it is the other colour
         possible_moves = []
-        x = self.x
-        y = self.y
-        for x_inc, y_inc in increment_lst:
-            for i in range(8):
-                if not self.on_board((x+x_inc*(i+1), y+y_inc*(i+1))):
-                    break
-                elif (x+x_inc*(i+1), y+y_inc*(i+1)) in board.board_dict:
-                    if board.board_dict[(x+x_inc*(i+1), y+y_inc*(i+1))].colour != self.colour:
-                        possible_moves.append((x+x_inc*(i+1), y+y_inc*(i+1)))
-                    break
+        squares = board.squares
+        rays = RAY_SQUARES
+        origin = self.x + 8 * self.y
+        for direction in directions:
+            for index in rays[direction][origin]:
+                piece = squares[index]
+                if piece is None:
+                    possible_moves.append(SQUARES[index])
                 else:
-                    possible_moves.append((x+x_inc*(i+1), y+y_inc*(i+1)))
+                    if piece.colour is not self.colour:
+                        possible_moves.append(SQUARES[index])
+                    break
         return possible_moves
 
+    def step(self, table, board):
+        # the squares in table (KNIGHT_SQUARES or KING_SQUARES) from this piece's square that aren't our own pieces
+        squares = board.squares
+        return [SQUARES[index] for index in table[self.x + 8 * self.y]
+                if squares[index] is None or squares[index].colour is not self.colour]
+
 
 class Knight(Piece):
+    __slots__ = ()
+    kind = 1
+
     def __init__(self, x: int, y: int, colour: Enum, has_moved=False):
-        super().__init__(x, y, colour)
+        super().__init__(x, y, colour, has_moved)
         self.letter = "♘" if colour == Colour.BLACK else "♞"
 
     def get_valid_moves(self, board, last_moved: str, initial_pos: tuple, final_pos: tuple, exclude_castle_moves=False):
-        x = self.x
-        y = self.y
-        all_squares = [(x+1, y-2), (x+2, y-1), (x+2, y+1), (x+1, y+2),
-                       (x-1, y-2), (x-2, y-1), (x-1, y+2), (x-2, y+1)]
-        # filter out moves that are not on the board
-        moves_on_board = [
-            square for square in all_squares if self.on_board(square)]
-
-        valid_moves = [move for move in moves_on_board if (
-            not move in board.board_dict) or (board.board_dict[move].colour != self.colour)]
-
-        return valid_moves
+        return self.step(KNIGHT_SQUARES, board)
 
     def deepcopy(self):
         return Knight(self.x, self.y, self.colour, self.has_moved)
 
 
 class Bishop(Piece):
+    __slots__ = ()
+    kind = 2
+
     def __init__(self, x: int, y: int, colour: Enum, has_moved=False):
-        super().__init__(x, y, colour)
+        super().__init__(x, y, colour, has_moved)
         self.letter = "♗" if colour == Colour.BLACK else "♝"
 
     def get_valid_moves(self, board, last_moved: str, initial_pos: tuple, final_pos: tuple, exclude_castle_moves=False):
-        return self.increment([(1, -1), (1, 1), (-1, 1), (-1, -1)], board)
+        return self.increment((7, 2, 3, 6), board)
 
     def deepcopy(self):
         return Bishop(self.x, self.y, self.colour, self.has_moved)
 
 
 class Rook(Piece):
+    __slots__ = ()
+    kind = 3
+
     def __init__(self, x: int, y: int, colour: Enum, has_moved=False):
-        super().__init__(x, y, colour)
+        super().__init__(x, y, colour, has_moved)
         self.letter = "♖" if colour == Colour.BLACK else "♜"
 
     def get_valid_moves(self, board, last_moved: str, initial_pos: tuple, final_pos: tuple, exclude_castle_moves=False):
-        return self.increment([(1, 0), (0, 1), (-1, 0), (0, -1)], board)
+        return self.increment((0, 1, 4, 5), board)
 
     def deepcopy(self):
         return Rook(self.x, self.y, self.colour, self.has_moved)
 
 
 class Queen(Piece):
+    __slots__ = ()
+    kind = 4
+
     def __init__(self, x: int, y: int, colour: Enum, has_moved=False):
-        super().__init__(x, y, colour)
+        super().__init__(x, y, colour, has_moved)
         self.letter = "♕" if colour == Colour.BLACK else "♛"
 
     def get_valid_moves(self, board, last_moved: str, initial_pos: tuple, final_pos: tuple, exclude_castle_moves=False):
-        return self.increment([(1, 0), (0, 1), (-1, 0), (0, -1), (1, -1), (1, 1), (-1, 1), (-1, -1)], board)
+        return self.increment((0, 1, 4, 5, 7, 2, 3, 6), board)
 
     def deepcopy(self):
         return Queen(self.x, self.y, self.colour, self.has_moved)
 
 
 class King(Piece):
+    __slots__ = ()
+    kind = 5
+
     def __init__(self, x: int, y: int, colour: Enum, has_moved=False):
-        super().__init__(x, y, colour)
+        super().__init__(x, y, colour, has_moved)
         self.letter = "♔" if colour == Colour.BLACK else "♚"
 
     def get_valid_moves(self, board, last_moved: str, initial_pos: tuple, final_pos: tuple, exclude_castle_moves=False):
-        x = self.x
-        y = self.y
-
-        moves_on_board = [(x-1, y-1), (x, y-1), (x+1, y-1), (x-1, y),
-                          (x+1, y), (x-1, y+1), (x, y+1), (x+1, y+1)]
-
-        possible_moves = [
-            square for square in moves_on_board if self.on_board(square)]
-
-        valid_moves = [move for move in possible_moves if (
-            not move in board.board_dict) or (board.board_dict[move].colour != self.colour)]
+        valid_moves = self.step(KING_SQUARES, board)
 
         if not exclude_castle_moves:
             can_queenside, can_kingside = self.can_castle(board)
@@ -120,80 +438,45 @@ class King(Piece):
         return valid_moves
 
     def can_castle(self, board):
-        # if king has moved return False
-        if self.has_moved:
-            return False, False
-
-        queenside = True
-        kingside = True
-        rank = 0 if self.colour == Colour.BLACK else 7
-        # if the queenside rook is no longer in its original place (captured or moved), or it moved but returned back there, or another piece is there instead, queenside castle is not possible
-        if (not (0, rank) in board.board_dict) or board.board_dict[(0, rank)].has_moved:
-            queenside = False
-        # if the kingside rook is no longer in its original place (captured or moved), or it moved but returned back there, or another piece is there instead, kingside castle is not possible
-        if (not (7, rank) in board.board_dict) or board.board_dict[(7, rank)].has_moved:
-            kingside = False
-        # if there are pieces in between king and queenside rook, then queenside castle is also not possible
-        in_btwn_queenside = [(1, rank), (2, rank), (3, rank)]
-        for square in in_btwn_queenside:
-            if square in board.board_dict:
-                queenside = False
-        # if there are pieces in between king and kingside rook, then kingside castle is also not possible
-        in_btwn_kingside = [(5, rank), (6, rank)]
-        for square in in_btwn_kingside:
-            if square in board.board_dict:
-                kingside = False
-        # for every opposing coloured piece, check if the squares in between the king and queenside rook (including the king) are in them
-        # if they are, then queenside castle is not possible
-        in_btwn_queenside.append((self.x, self.y))
-        for piece in board.board_dict:
-            if board.board_dict[piece].colour != self.colour:
-                moves = board.board_dict[piece].get_valid_moves(
-                    board, board.last_moved, board.initial_pos, board.final_pos, exclude_castle_moves=True)
-                for square in in_btwn_queenside:
-                    if square in moves:
-                        queenside = False
-        # for every opposing coloured piece, check if the squares in between the king and queenside rook (including the king) are in them
-        # if they are, then queenside castle is not possible
-        in_btwn_kingside.append((self.x, self.y))
-        for piece in board.board_dict:
-            if board.board_dict[piece].colour != self.colour:
-                moves = board.board_dict[piece].get_valid_moves(
-                    board, board.last_moved, board.initial_pos, board.final_pos, exclude_castle_moves=True)
-                for square in in_btwn_kingside:
-                    if square in moves:
-                        kingside = False
-
-        return queenside, kingside
+        return board._castling(self.colour.value)
 
     def deepcopy(self):
         return King(self.x, self.y, self.colour, self.has_moved)
 
 
 class Pawn(Piece):
+    __slots__ = ("direction_factor",)
+    kind = 0
+
     def __init__(self, x: int, y: int, colour: Enum, has_moved=False):
-        super().__init__(x, y, colour)
+        super().__init__(x, y, colour, has_moved)
         self.letter = "♙" if colour == Colour.BLACK else "♟︎"
         self.direction_factor = 1 if colour == Colour.BLACK else -1
 
     def get_valid_moves(self, board, last_moved: str, initial_pos: tuple, final_pos: tuple, exclude_castle_moves=False):
-        x = self.x
-        y = self.y
-        dir_factor = self.direction_factor
+        squares = board.squares
+        side = self.colour.value
+        origin = self.x + 8 * self.y
         possible_moves = []
         # forward squares (2 squares and 1 square)
-        if not self.has_moved and not (x, y + 2*dir_factor) in board.board_dict and not (x, y + dir_factor) in board.board_dict:
-            possible_moves.append((x, y + 2*dir_factor))
-        if not (x, y + dir_factor) in board.board_dict:
-            possible_moves.append((x, y + dir_factor))
-        # diagonal squares (x+1, y + dir_factor)
-        # Case 1: Diagonal square has opposing colour piece
-        if (x+1, y + dir_factor) in board.board_dict and board.board_dict[(x+1, y + dir_factor)].colour != self.colour:
-            possible_moves.append((x+1, y + dir_factor))
-        if (x-1, y + dir_factor) in board.board_dict and board.board_dict[(x-1, y + dir_factor)].colour != self.colour:
-            possible_moves.append((x-1, y + dir_factor))
-        # Case 2: En passant
+        for ahead in PAWN_PUSH_SQUARES[side][origin]:
+            if squares[ahead] is None:
+                for two_ahead in PAWN_PUSH_SQUARES[side][ahead]:
+                    if not self.has_moved and squares[two_ahead] is None:
+                        possible_moves.append(SQUARES[two_ahead])
+                possible_moves.append(SQUARES[ahead])
+        # diagonal squares with an opposing colour piece
+        for diagonal in PAWN_CAPTURE_SQUARES[side][origin]:
+            if squares[diagonal] is not None and squares[diagonal].colour is not self.colour:
+                possible_moves.append(SQUARES[diagonal])
+        # a move to the last rank is one move per piece it can promote to
+        if self.y + self.direction_factor == 0 or self.y + self.direction_factor == 7:
+            possible_moves = [(x, y, piece) for x, y in possible_moves for piece in PROMOTION_PIECES]
+        # en passant
         if (last_moved == "♙" or last_moved == "♟︎") and abs(final_pos[1] - initial_pos[1]) == 2:
+            x = self.x
+            y = self.y
+            dir_factor = self.direction_factor
             if (x+1, y) == final_pos:
                 possible_moves.append((x+1, y + dir_factor, dir_factor))
             elif (x-1, y) == final_pos:
@@ -204,198 +487,1025 @@ class Pawn(Piece):
         return Pawn(self.x, self.y, self.colour, self.has_moved)
 
 
+class PieceType(NamedTuple):
+    # one shared, immutable object per kind of piece and colour, which is what a Board stores on its squares
+    piece_class: type
+    colour: Colour
+    # colour.value, which is slow to look up through the Enum
+    side: int
+    kind: int
+    # position of this piece's bitboard in Board.bitboards
+    index: int
+    letter: str
+
+
+PIECE_TYPES = [PieceType(piece_class, colour, colour.value, piece_class.kind, piece_class.kind + offset,
+                         piece_class(0, 0, colour).letter)
+               for offset, colour in [(0, Colour.WHITE), (6, Colour.BLACK)]
+               for piece_class in [Pawn, Knight, Bishop, Rook, Queen, King]]
+BACK_RANK = [Rook, Knight, Bishop, Queen, King, Bishop, Knight, Rook]
+PROMOTION_KINDS = {"N": 1, "B": 2, "R": 3, "Q": 4}
+PROMOTION_PIECES = ["Q", "R", "B", "N"]
+
+# Packed moves: a move in 16 bits, for array("H") move lists and for storing. The from square's bit index is in
+# bits 0 to 5, the to square's in bits 6 to 11 (for castling, where the king ends up) and a flag in bits 12 to 15:
+# one of the kinds below, plus MOVE_CAPTURE for a capture.
+MOVE_EN_PASSANT = 1
+MOVE_KINGSIDE = 2
+MOVE_QUEENSIDE = 3
+# promotions are MOVE_PROMOTION + PieceType.kind - 1, from knight (4) to queen (7)
+MOVE_PROMOTION = 4
+MOVE_CAPTURE = 8
+PROMOTION_FLAGS = {piece: MOVE_PROMOTION + kind - 1 for piece, kind in PROMOTION_KINDS.items()}
+PROMOTION_LETTERS = "NBRQ"
+# pawn moves to the last rank, one for each piece, queen first as push_moves has them
+PROMOTION_ORDER = [PROMOTION_FLAGS[piece] for piece in PROMOTION_PIECES]
+# packed move lists, keyed like _TARGET_MOVES and _PUSH_MOVES (plus the flag) and bounded the same way
+_PACKED_TARGET_MOVES = {}
+_PACKED_PUSH_MOVES = {}
+_UNPACKED_MOVES = {}
+
+
+def pack_move(piece_location: tuple, move_location: tuple, capture=False) -> int:
+    # the packed form of a (piece_location, move_location) pair; capture says whether the to square is taken
+    from_index = piece_location[0] + 8 * piece_location[1]
+    if len(move_location) == 1:
+        if move_location[0] == "Kingside":
+            return from_index | (from_index + 2) << 6 | MOVE_KINGSIDE << 12
+        return from_index | (from_index - 2) << 6 | MOVE_QUEENSIDE << 12
+    flag = MOVE_CAPTURE if capture else 0
+    if len(move_location) == 3:
+        flag = flag | PROMOTION_FLAGS[move_location[2]] if move_location[2] in PROMOTION_FLAGS \
+            else MOVE_EN_PASSANT | MOVE_CAPTURE
+    return from_index | (move_location[0] + 8 * move_location[1]) << 6 | flag << 12
+
+
+def unpack_move(move: int) -> tuple:
+    # the (piece_location, move_location) pair for a packed move; pairs are shared, so don't change them
+    pair = _UNPACKED_MOVES.get(move)
+    if pair is None:
+        from_index = move & 63
+        to_index = move >> 6 & 63
+        kind = move >> 12 & 7
+        if kind == MOVE_KINGSIDE:
+            move_location = ("Kingside",)
+        elif kind == MOVE_QUEENSIDE:
+            move_location = ("Queenside",)
+        elif kind == MOVE_EN_PASSANT:
+            move_location = SQUARES[to_index] + (1 if to_index > from_index else -1,)
+        elif kind >= MOVE_PROMOTION:
+            move_location = SQUARES[to_index] + (PROMOTION_LETTERS[kind - MOVE_PROMOTION],)
+        else:
+            move_location = SQUARES[to_index]
+        pair = _UNPACKED_MOVES[move] = (SQUARES[from_index], move_location)
+    return pair
+
+
+def packed_target_moves(square: int, captures: int, quiet: int) -> array:
+    # target_moves packed, the captures (flagged as such) before the quiet moves
+    key = (captures << 64 | quiet) << 6 | square
+    moves = _PACKED_TARGET_MOVES.get(key)
+    if moves is None:
+        # filled before it goes in the memo, where other threads can see it
+        moves = array("H")
+        for targets, flag in [(captures, MOVE_CAPTURE << 12), (quiet, 0)]:
+            while targets:
+                low = targets & -targets
+                moves.append(square | (low.bit_length() - 1) << 6 | flag)
+                targets ^= low
+        if len(_PACKED_TARGET_MOVES) >= MAX_MEMO_ENTRIES:
+            _PACKED_TARGET_MOVES.clear()
+        _PACKED_TARGET_MOVES[key] = moves
+    return moves
+
+
+def add_push_moves(moves: array, targets: int, distance: int, flag: int) -> None:
+    # push_moves packed, with flag on every move, and added to moves
+    while targets:
+        shift = (targets & -targets).bit_length() - 1 & 56
+        row = targets >> shift & 255
+        targets ^= row << shift
+        key = ((row << 6 | shift) << 6 | (distance + 16)) << 4 | flag
+        found = _PACKED_PUSH_MOVES.get(key)
+        if found is None:
+            found = array("H")
+            for square in range(shift, shift + 8):
+                if not row >> (square - shift) & 1:
+                    continue
+                move = square + distance | square << 6
+                if square < 8 or square >= 56:
+                    found.extend(move | (flag | promotion) << 12 for promotion in PROMOTION_ORDER)
+                else:
+                    found.append(move | flag << 12)
+            _PACKED_PUSH_MOVES[key] = found
+        moves += found
+
+
+def piece_type(piece: Piece) -> PieceType:
+    return PIECE_TYPES[piece.kind + (6 if piece.colour == Colour.BLACK else 0)]
+
+
+FEN_LETTERS = "PNBRQKpnbrqk"
+FEN_PIECE_TYPES = {letter: PIECE_TYPES[index] for index, letter in enumerate(FEN_LETTERS)}
+FEN_CASTLING = {"K": WHITE_KINGSIDE, "Q": WHITE_QUEENSIDE, "k": BLACK_KINGSIDE, "q": BLACK_QUEENSIDE}
+# to_bytes square code for a pawn that has just moved two squares and can be taken en passant
+EN_PASSANT_CODE = 13
+
+
+def _castling_rights(squares: list, castling_rights: int) -> int:
+    # the rights that still have their king and rook on their starting squares
+    for right, king_index, king, rook_index, rook in CASTLING_PIECES:
+        if squares[king_index] is not PIECE_TYPES[king] or squares[rook_index] is not PIECE_TYPES[rook]:
+            castling_rights &= ~right
+    return castling_rights
+
+
+def _moved_mask(squares: list, castling_rights: int) -> int:
+    # what a position without its history says about which pieces have moved: pawns off their starting rank,
+    # and kings and rooks without castling rights
+    moved = 0
+    for index, piece in enumerate(squares):
+        if piece is None:
+            continue
+        if piece.kind == 0:
+            if index >> 3 != (6 if piece.side == 1 else 1):
+                moved |= 1 << index
+        elif piece.kind == 5 or piece.kind == 3:
+            moved |= 1 << index
+    for right, king_index, _, rook_index, _ in CASTLING_PIECES:
+        if castling_rights & right:
+            moved &= ~(1 << king_index | 1 << rook_index)
+    return moved
+
+
 class Board:
-    def __init__(self, board_dict={}, last_moved=None, initial_pos=None, final_pos=None) -> None:
-        self.board_dict = {}
+    # shared by every board, so a position seen in one game is already known in the next
+    move_cache = LegalMoveCache()
+
+    def __init__(self, board_dict={}, last_moved=None, initial_pos=None, final_pos=None, turn=Colour.WHITE, castling_rights=None,
+                 halfmove_clock=0, fullmove_number=1) -> None:
+        # squares[x + 8*y] is the PieceType on (x, y) or None, and moved has the bit for every square whose piece
+        # has moved
+        self.squares = [None] * 64
+        self.moved = 0
         if len(board_dict) == 0:
-            # WHITE PIECES
-            # set white pawns
-            for x in range(8):
-                self.board_dict[(x, 6)] = Pawn(x, 6, Colour.WHITE)
-            # set white king
-            self.board_dict[(4, 7)] = King(4, 7, Colour.WHITE)
-            # set white queen
-            self.board_dict[(3, 7)] = Queen(3, 7, Colour.WHITE)
-            # set white rooks
-            self.board_dict[(0, 7)] = Rook(0, 7, Colour.WHITE)
-            self.board_dict[(7, 7)] = Rook(0, 7, Colour.WHITE)
-            # set white bishops
-            self.board_dict[(2, 7)] = Bishop(2, 7, Colour.WHITE)
-            self.board_dict[(5, 7)] = Bishop(5, 7, Colour.WHITE)
-            # set white knights
-            self.board_dict[(1, 7)] = Knight(1, 7, Colour.WHITE)
-            self.board_dict[(6, 7)] = Knight(6, 7, Colour.WHITE)
-            # BLACK PIECES
-            # set black pawns
-            for x in range(8):
-                self.board_dict[(x, 1)] = Pawn(x, 1, Colour.BLACK)
-            # set black king
-            self.board_dict[(4, 0)] = King(4, 0, Colour.BLACK)
-            # set black queen
-            self.board_dict[(3, 0)] = Queen(3, 0, Colour.BLACK)
-            # set black rooks
-            self.board_dict[(0, 0)] = Rook(0, 0, Colour.BLACK)
-            self.board_dict[(7, 0)] = Rook(7, 0, Colour.BLACK)
-            # set black bishops
-            self.board_dict[(2, 0)] = Bishop(2, 0, Colour.BLACK)
-            self.board_dict[(5, 0)] = Bishop(5, 0, Colour.BLACK)
-            # set black knights
-            self.board_dict[(1, 0)] = Knight(1, 0, Colour.BLACK)
-            self.board_dict[(6, 0)] = Knight(6, 0, Colour.BLACK)
+            for x, piece_class in enumerate(BACK_RANK):
+                self.squares[x] = PIECE_TYPES[piece_class.kind + 6]
+                self.squares[x + 8] = PIECE_TYPES[6]
+                self.squares[x + 48] = PIECE_TYPES[0]
+                self.squares[x + 56] = PIECE_TYPES[piece_class.kind]
         else:
-            self.board_dict = board_dict
+            for square, piece in board_dict.items():
+                index = square[0] + 8 * square[1]
+                self.squares[index] = piece_type(piece)
+                if piece.has_moved:
+                    self.moved |= 1 << index
+        self._setup(last_moved, initial_pos, final_pos, turn, castling_rights, halfmove_clock, fullmove_number)
+
+    def _setup(self, last_moved, initial_pos, final_pos, turn, castling_rights, halfmove_clock=0,
+               fullmove_number=1) -> None:
+        # the rest of the position, built from squares and moved
+
+        # one bitboard per piece kind and colour, indexed by PieceType.index
+        self.bitboards = [0] * 12
+        # occupancy[0] is every piece, occupancy[colour.value] is that colour's pieces
+        self.occupancy = [0, 0, 0]
+        for index, piece in enumerate(self.squares):
+            if piece is not None:
+                self.bitboards[piece.index] |= 1 << index
+                self.occupancy[piece.side] |= 1 << index
+                self.occupancy[0] |= 1 << index
 
         self.last_moved = last_moved
         self.initial_pos = initial_pos
         self.final_pos = final_pos
+        # colour to move; push hands the move to the other colour
+        self.turn = turn
+        # KQkq flags; without them, a side may castle with a king and rook that haven't moved from their squares
+        if castling_rights is None:
+            castling_rights = 0
+            for right, king_index, king, rook_index, rook in CASTLING_PIECES:
+                if self.squares[king_index] is PIECE_TYPES[king] and self.squares[rook_index] is PIECE_TYPES[rook] \
+                        and not self.moved & (1 << king_index | 1 << rook_index):
+                    castling_rights |= right
+        self.castling_rights = castling_rights
+        self.en_passant_file = self._en_passant_file()
+        self.key = self.compute_key()
+        # white's middlegame and endgame scores and the game phase, kept up to date square by square
+        self.score_mg, self.score_eg, self.phase = self.compute_scores()
+        # moves since the last capture or pawn move, and the FEN move number
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        # how many times each position key has come up in the game so far, counted as moves are pushed and popped
+        self.repetitions = {self.key: 1}
+        # one entry per pushed move, holding what pop needs to restore it
+        self.move_stack = []
+        self._board_dict = None
+
+    @property
+    def board_dict(self) -> dict:
+        # (x, y) -> Piece for every occupied square, built when first asked for after a change. The board doesn't
+        # use it itself, and changing these pieces doesn't change the board.
+        if self._board_dict is None:
+            board_dict = {}
+            for index, piece in enumerate(self.squares):
+                if piece is not None:
+                    x, y = SQUARES[index]
+                    board_dict[(x, y)] = piece.piece_class(
+                        x, y, piece.colour, bool(self.moved >> index & 1))
+            self._board_dict = board_dict
+        return self._board_dict
+
+    @classmethod
+    def from_fen(cls, fen: str):
+        fields = fen.split()
+        rows = fields[0].split("/") if fields else []
+        if len(rows) != 8:
+            raise ValueError("FEN needs 8 ranks: %r" % fen)
+        board = cls.__new__(cls)
+        squares = [None] * 64
+        for y, row in enumerate(rows):
+            x = 0
+            for char in row:
+                if char in "12345678":
+                    x += int(char)
+                elif char in FEN_PIECE_TYPES and x < 8:
+                    squares[x + 8 * y] = FEN_PIECE_TYPES[char]
+                    x += 1
+                else:
+                    raise ValueError("bad rank %r in FEN %r" % (row, fen))
+            if x != 8:
+                raise ValueError("bad rank %r in FEN %r" % (row, fen))
+        turn = Colour.BLACK if len(fields) > 1 and fields[1] == "b" else Colour.WHITE
+        castling_rights = 0
+        for char in fields[2] if len(fields) > 2 else "-":
+            castling_rights |= FEN_CASTLING.get(char, 0)
+        castling_rights = _castling_rights(squares, castling_rights)
+        board.squares = squares
+        board.moved = _moved_mask(squares, castling_rights)
+        # an en passant square means the opponent just pushed a pawn two squares past it
+        last_moved, initial_pos, final_pos = None, None, None
+        if len(fields) > 3 and fields[3] != "-":
+            x = ord(fields[3][0]) - ord("a")
+            if not 0 <= x < 8:
+                raise ValueError("bad en passant square in FEN %r" % fen)
+            if turn == Colour.WHITE:
+                last_moved, initial_pos, final_pos = PIECE_TYPES[6].letter, (x, 1), (x, 3)
+            else:
+                last_moved, initial_pos, final_pos = PIECE_TYPES[0].letter, (x, 6), (x, 4)
+        try:
+            halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError("bad move counters in FEN %r" % fen) from None
+        board._setup(last_moved, initial_pos, final_pos, turn, castling_rights, halfmove_clock, fullmove_number)
+        return board
+
+    def to_fen(self) -> str:
+        # the en passant square is only written when a capture there is possible
+        rows = []
+        for y in range(8):
+            row = ""
+            empty = 0
+            for x in range(8):
+                piece = self.squares[x + 8 * y]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += FEN_LETTERS[piece.index]
+            rows.append(row + (str(empty) if empty else ""))
+        castling = "".join(char for char, right in FEN_CASTLING.items() if self.castling_rights & right) or "-"
+        en_passant = "-"
+        if self.en_passant_file is not None:
+            en_passant = "abcdefgh"[self.en_passant_file] + ("6" if self.turn == Colour.WHITE else "3")
+        return "%s %s %s %s %d %d" % ("/".join(rows), "w" if self.turn == Colour.WHITE else "b", castling, en_passant,
+                                      self.halfmove_clock, self.fullmove_number)
+
+    def to_bytes(self) -> bytes:
+        # 33 bytes: a 4 bit code for each square, two squares to a byte, then the side to move in bit 0 and the
+        # castling rights in bits 1 to 4. A pawn that can be taken en passant gets its own code.
+        codes = [0 if piece is None else piece.index + 1 for piece in self.squares]
+        if self.en_passant_file is not None:
+            codes[self.final_pos[0] + 8 * self.final_pos[1]] = EN_PASSANT_CODE
+        data = bytearray(33)
+        for index in range(32):
+            data[index] = codes[2 * index] | codes[2 * index + 1] << 4
+        data[32] = (self.turn == Colour.BLACK) | self.castling_rights << 1
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        if len(data) != 33:
+            raise ValueError("a position is 33 bytes, not %d" % len(data))
+        board = cls.__new__(cls)
+        turn = Colour.BLACK if data[32] & 1 else Colour.WHITE
+        castling_rights = data[32] >> 1 & 15
+        squares = [None] * 64
+        last_moved, initial_pos, final_pos = None, None, None
+        for index in range(64):
+            code = data[index >> 1] >> 4 * (index & 1) & 15
+            if code == EN_PASSANT_CODE:
+                # the side to move can take this pawn, so it is the other side's
+                pawn = PIECE_TYPES[6 if turn == Colour.WHITE else 0]
+                squares[index] = pawn
+                x, y = SQUARES[index]
+                last_moved, initial_pos, final_pos = pawn.letter, (x, y + 2 * (1 if pawn.side == 1 else -1)), (x, y)
+            elif code > 12:
+                raise ValueError("bad square code %d" % code)
+            elif code:
+                squares[index] = PIECE_TYPES[code - 1]
+        castling_rights = _castling_rights(squares, castling_rights)
+        board.squares = squares
+        board.moved = _moved_mask(squares, castling_rights)
+        board._setup(last_moved, initial_pos, final_pos, turn, castling_rights)
+        return board
+
+    def __hash__(self) -> int:
+        return self.key
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Board) and self.key == other.key
+
+    def _en_passant_file(self):
+        # the file of a pawn that just moved two squares, if an opposing pawn is placed to take it en passant
+        if (self.last_moved == "♙" or self.last_moved == "♟︎") and abs(self.final_pos[1] - self.initial_pos[1]) == 2:
+            pawn = self.squares[self.final_pos[0] + 8 * self.final_pos[1]]
+            if pawn is not None:
+                passed = self.final_pos[0] + 4 * \
+                    (self.final_pos[1] + self.initial_pos[1])
+                if PAWN_ATTACKS[pawn.side][passed] & self.bitboards[6 if pawn.side == 1 else 0]:
+                    return self.final_pos[0]
+        return None
+
+    def compute_key(self) -> int:
+        # the Zobrist key from scratch; push and pop keep self.key equal to this incrementally
+        key = ZOBRIST_CASTLING[self.castling_rights]
+        for index, piece in enumerate(self.squares):
+            if piece is not None:
+                key ^= ZOBRIST_PIECES[piece.index][index]
+        if self.turn == Colour.BLACK:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant_file is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant_file]
+        return key
+
+    def compute_scores(self) -> tuple:
+        # the evaluation terms from scratch; _set_square keeps the board's own ones equal to these
+        score_mg, score_eg, phase = 0, 0, 0
+        for index, piece in enumerate(self.squares):
+            if piece is not None:
+                score_mg += SCORES_MG[piece.index][index]
+                score_eg += SCORES_EG[piece.index][index]
+                phase += PHASES[piece.index]
+        return score_mg, score_eg, phase
+
+    def evaluate(self) -> int:
+        # centipawns in white's favour, blending the middlegame and endgame scores by how much material is left
+        phase = min(self.phase, MAX_PHASE)
+        return (self.score_mg * phase + self.score_eg * (MAX_PHASE - phase)) // MAX_PHASE
 
     def __str__(self) -> None:
         s = ""
         for y in range(8):
             arr = []
             for x in range(8):
-                if (x, y) in self.board_dict:
-                    arr.append(self.board_dict[(x, y)].letter)
-                else:
-                    arr.append("-")
+                piece = self.squares[x + 8 * y]
+                arr.append(piece.letter if piece is not None else "-")
             s += " ".join(arr) + "\n"
         return s
 
     def deepcopy(self):
-        copy = {}
+        # a position is a handful of lists and numbers, so copying it is a few list copies rather than
+        # rebuilding every piece
+        copy = Board.__new__(Board)
+        copy.squares = self.squares[:]
+        copy.moved = self.moved
+        copy.bitboards = self.bitboards[:]
+        copy.occupancy = self.occupancy[:]
+        copy.last_moved = self.last_moved
+        copy.initial_pos = self.initial_pos
+        copy.final_pos = self.final_pos
+        copy.turn = self.turn
+        copy.castling_rights = self.castling_rights
+        copy.en_passant_file = self.en_passant_file
+        copy.key = self.key
+        copy.score_mg = self.score_mg
+        copy.score_eg = self.score_eg
+        copy.phase = self.phase
+        copy.halfmove_clock = self.halfmove_clock
+        copy.fullmove_number = self.fullmove_number
+        copy.repetitions = dict(self.repetitions)
+        copy.move_stack = []
+        copy._board_dict = None
+        return copy
 
-        for piece in self.board_dict:
-            copy[(piece[0], piece[1])] = self.board_dict[piece].deepcopy()
+    def king_square(self, colour: Enum):
+        # the king's bitboard is kept up to date by every move, so there is nothing to search for
+        kings = self.bitboards[5 if colour == Colour.WHITE else 11]
+        if not kings:
+            return None
+        return SQUARES[kings.bit_length() - 1]
+
+    def _attacked(self, square: int, side: int, occupied=None) -> bool:
+        # whether the pieces of colour value side attack bit index square, looking outwards from square. occupied
+        # stands in for the board's occupancy, to see through a king that is about to move.
+        bitboards = self.bitboards
+        offset = 6 if side == 2 else 0
+        if KNIGHT_ATTACKS[square] & bitboards[offset + 1]:
+            return True
+        # a pawn attacks square exactly when a pawn of the other colour on square would attack it back
+        if PAWN_ATTACKS[3 - side][square] & bitboards[offset]:
+            return True
+        if KING_ATTACKS[square] & bitboards[offset + 5]:
+            return True
+        if occupied is None:
+            occupied = self.occupancy[0]
+        queens = bitboards[offset + 4]
+        if bishop_attacks(square, occupied) & (bitboards[offset + 2] | queens):
+            return True
+        if rook_attacks(square, occupied) & (bitboards[offset + 3] | queens):
+            return True
+        return False
 
-        return Board(board_dict=copy, last_moved=self.last_moved, initial_pos=self.initial_pos, final_pos=self.final_pos)
+    def is_square_attacked(self, square: tuple, by_colour: Enum) -> bool:
+        return self._attacked(square[0] + 8 * square[1], by_colour.value)
 
     def in_check(self, colour: Enum):
-        # get king position of same colour
-        letter = "♔" if colour == Colour.BLACK else "♚"
-        king_posn = None
-        for piece in self.board_dict:
-            if self.board_dict[piece].letter == letter and self.board_dict[piece].colour == colour:
-                king_posn = piece
-
-        # get copy of board
-        copy_board = self.deepcopy()
-        # search for king's position in opposing colour pieces
-        for piece in self.board_dict:
-            if self.board_dict[piece].colour != colour and king_posn in self.board_dict[piece].get_valid_moves(copy_board, self.last_moved, self.initial_pos, self.final_pos, exclude_castle_moves=True):
-                return True
-        return False
+        kings = self.bitboards[5 if colour == Colour.WHITE else 11]
+        if not kings:
+            return False
+        return self._attacked(kings.bit_length() - 1, 2 if colour == Colour.WHITE else 1)
+
+    def _castling(self, side: int):
+        # (queenside, kingside) for colour value side. The castling rights say whether the king or rooks have
+        # moved, so all that is left is checking the squares the king passes are empty and not attacked.
+        if side == 2:
+            base, enemy, queenside_right, kingside_right = 0, 1, BLACK_QUEENSIDE, BLACK_KINGSIDE
+        else:
+            base, enemy, queenside_right, kingside_right = 56, 2, WHITE_QUEENSIDE, WHITE_KINGSIDE
+        rights = self.castling_rights
+        if not rights & (queenside_right | kingside_right):
+            return False, False
+        # castling out of check is not allowed
+        if self._attacked(base + 4, enemy):
+            return False, False
+        occupied = self.occupancy[0]
+        # the queenside rook needs (1, rank) to (3, rank) empty, and the king passes (3, rank) and lands on (2, rank)
+        queenside = bool(rights & queenside_right) and not occupied & (0b1110 << base) \
+            and not self._attacked(base + 3, enemy) and not self._attacked(base + 2, enemy)
+        # the kingside rook needs (5, rank) and (6, rank) empty, and the king crosses both
+        kingside = bool(rights & kingside_right) and not occupied & (0b1100000 << base) \
+            and not self._attacked(base + 5, enemy) and not self._attacked(base + 6, enemy)
+        return queenside, kingside
 
     def make_move(self, piece_location: tuple, move_location: tuple) -> None:
-        # regular move
-        if len(move_location) == 2:
-            moved_piece = self.board_dict[piece_location].deepcopy()
-            del self.board_dict[piece_location]
-            moved_piece.x = move_location[0]
-            moved_piece.y = move_location[1]
-            moved_piece.has_moved = True
-            self.board_dict[move_location] = moved_piece
-            # promote piece if moved piece is a pawn and it reached the end
-            if (self.board_dict[move_location].letter == "♙" and move_location[1] == 7) or (self.board_dict[move_location].letter == "♟︎" and move_location[1] == 0):
-                self.promote(move_location)
-        # en passant 
-        elif len(move_location) == 3:
-            moved_piece = self.board_dict[piece_location].deepcopy()
-            del self.board_dict[piece_location]
-            delete_direction = move_location[2]
-            del self.board_dict[(
-                move_location[0], move_location[1] - delete_direction)]
-            moved_piece.x = move_location[0]
-            moved_piece.y = move_location[1]
-            moved_piece.has_moved = True
-            self.board_dict[(move_location[0], move_location[1])] = moved_piece
-        # castling
+        self.push(piece_location, move_location)
+
+    def _set_square(self, index: int, piece) -> None:
+        # put piece (a PieceType, or nothing if piece is None) on bit index, keeping the bitboards, key and
+        # evaluation in sync
+        bit = 1 << index
+        old = self.squares[index]
+        if old is not None:
+            self.bitboards[old.index] ^= bit
+            self.occupancy[old.side] ^= bit
+            self.occupancy[0] ^= bit
+            self.key ^= ZOBRIST_PIECES[old.index][index]
+            self.score_mg -= SCORES_MG[old.index][index]
+            self.score_eg -= SCORES_EG[old.index][index]
+            self.phase -= PHASES[old.index]
+        self.squares[index] = piece
+        if piece is not None:
+            self.bitboards[piece.index] |= bit
+            self.occupancy[piece.side] |= bit
+            self.occupancy[0] |= bit
+            self.key ^= ZOBRIST_PIECES[piece.index][index]
+            self.score_mg += SCORES_MG[piece.index][index]
+            self.score_eg += SCORES_EG[piece.index][index]
+            self.phase += PHASES[piece.index]
+        self._board_dict = None
+
+    def _relocate(self, from_index: int, to_index: int, changed: list) -> None:
+        # move the piece on from_index to to_index, remembering the previous contents of both squares
+        piece = self.squares[from_index]
+        changed.append((from_index, piece))
+        changed.append((to_index, self.squares[to_index]))
+        self._set_square(from_index, None)
+        self._set_square(to_index, piece)
+        self.moved = (self.moved & ~(1 << from_index)) | 1 << to_index
+
+    def pack(self, piece_location: tuple, move_location: tuple) -> int:
+        # pack_move, with the capture flag from the board
+        capture = len(move_location) != 1 and self.squares[move_location[0] + 8 * move_location[1]] is not None
+        return pack_move(piece_location, move_location, capture)
+
+    def push(self, piece_location: tuple, move_location: tuple) -> None:
+        self.push_move(self.pack(piece_location, move_location))
+
+    def push_move(self, move: int) -> None:
+        # changed holds (bit index, previous PieceType or None) for every square the move changes
+        changed = []
+        self.move_stack.append((changed, self.last_moved, self.initial_pos, self.final_pos, self.turn,
+                                self.castling_rights, self.en_passant_file, self.key, self.moved,
+                                self.halfmove_clock, self.fullmove_number))
+        from_index = move & 63
+        to_index = move >> 6 & 63
+        kind = move >> 12 & 7
+        piece = self.squares[from_index]
+        side = piece.side
+        self.turn = Colour.BLACK if side == 1 else Colour.WHITE
+        # the pieces' part of the key is updated square by square, the rest of it here and below
+        self.key ^= ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_CASTLING[self.castling_rights]
+        if self.en_passant_file is not None:
+            self.key ^= ZOBRIST_EN_PASSANT[self.en_passant_file]
+        # castling moves start on the king's square, which clears that side's rights on its own
+        self.castling_rights &= CASTLING_MASKS[from_index]
+        self.en_passant_file = None
+        if kind == MOVE_KINGSIDE or kind == MOVE_QUEENSIDE:
+            base = 56 if side == 1 else 0
+            if kind == MOVE_QUEENSIDE:
+                self._relocate(base, base + 3, changed)
+                self.final_pos = ("Queenside",)
+            else:
+                self._relocate(base + 7, base + 5, changed)
+                self.final_pos = ("Kingside",)
+            self._relocate(from_index, to_index, changed)
+            self.last_moved = "castle"
+            self.halfmove_clock += 1
         else:
-            rank = 0 if self.board_dict[piece_location].colour == Colour.BLACK else 7
-            if move_location[0] == "Queenside":
-                queenside_rook_copy = self.board_dict[(0, rank)].deepcopy()
-                king_copy = self.board_dict[piece_location].deepcopy()
-                del self.board_dict[piece_location]
-                del self.board_dict[(0, rank)]
-                queenside_rook_copy.has_moved = True
-                queenside_rook_copy.x = 3
-                king_copy.has_moved = True
-                king_copy.x = 2
-                self.board_dict[(3, rank)] = queenside_rook_copy
-                self.board_dict[(2, rank)] = king_copy
+            if kind == MOVE_EN_PASSANT:
+                captured_index = to_index + (8 if side == 1 else -8)
+                changed.append((captured_index, self.squares[captured_index]))
+                self._set_square(captured_index, None)
+                self.moved &= ~(1 << captured_index)
             else:
-                kingside_rook_copy = self.board_dict[(7, rank)].deepcopy()
-                king_copy = self.board_dict[piece_location].deepcopy()
-                del self.board_dict[piece_location]
-                del self.board_dict[(7, rank)]
-                kingside_rook_copy.has_moved = True
-                kingside_rook_copy.x = 5
-                king_copy.has_moved = True
-                king_copy.x = 6
-                self.board_dict[(5, rank)] = kingside_rook_copy
-                self.board_dict[(6, rank)] = king_copy
-        self.last_moved = self.board_dict[(move_location[0], move_location[1])].letter if len(
-            move_location) != 1 else "castle"
-        self.initial_pos = piece_location
-        self.final_pos = move_location
-        return
-
-    def promote(self, move_location: tuple, piece="") -> None:
-        colour = self.board_dict[move_location].colour
-        valid_choice = False if not piece else True
-        while not valid_choice:
-            piece = input("What piece would you like to promote to at " +
-                          str(move_location) + " ?: ").upper()
-            if piece == "Q" or piece == "R" or piece == "N" or piece == "B":
-                valid_choice = True
+                self.castling_rights &= CASTLING_MASKS[to_index]
+            self._relocate(from_index, to_index, changed)
+            if piece.kind == 0:
+                if to_index < 8 or to_index >= 56:
+                    # a move to the last rank without a piece given is a queen
+                    changed.append((to_index, piece))
+                    self._set_square(to_index, PIECE_TYPES[(kind - 3 if kind >= MOVE_PROMOTION else 4) +
+                                                           (6 if side == 2 else 0)])
+                elif to_index - from_index == 16 or from_index - to_index == 16:
+                    # en passant is only possible if an opposing pawn stands next to the pawn's new square
+                    if PAWN_ATTACKS[side][(from_index + to_index) >> 1] & self.bitboards[6 if side == 1 else 0]:
+                        self.en_passant_file = to_index & 7
+                        self.key ^= ZOBRIST_EN_PASSANT[to_index & 7]
+                self.halfmove_clock = 0
+            # changed[1] is what was on the square moved to
+            elif changed[1][1] is not None:
+                self.halfmove_clock = 0
             else:
-                print("Invalid choice. Try again.")
+                self.halfmove_clock += 1
+            self.last_moved = self.squares[to_index].letter
+            self.final_pos = SQUARES[to_index]
+        self.key ^= ZOBRIST_CASTLING[self.castling_rights]
+        self.initial_pos = SQUARES[from_index]
+        if side == 2:
+            self.fullmove_number += 1
+        self.repetitions[self.key] = self.repetitions.get(self.key, 0) + 1
+
+    def pop(self) -> None:
+        count = self.repetitions[self.key]
+        if count == 1:
+            del self.repetitions[self.key]
+        else:
+            self.repetitions[self.key] = count - 1
+        changed, self.last_moved, self.initial_pos, self.final_pos, self.turn, self.castling_rights, \
+            self.en_passant_file, key, self.moved, self.halfmove_clock, self.fullmove_number = self.move_stack.pop()
+        # restore in reverse so a square touched twice ends up with its oldest occupant
+        for index, piece in reversed(changed):
+            self._set_square(index, piece)
+        self.key = key
+
+    def promote(self, move_location: tuple, piece="Q") -> None:
+        index = move_location[0] + 8 * move_location[1]
+        offset = 6 if self.squares[index].side == 2 else 0
+        if piece not in PROMOTION_KINDS:
+            raise ValueError("can't promote to %r" % piece)
         # set piece at move_location to the piece of choice
-        if piece == "N":
-            self.board_dict[move_location] = Knight(
-                move_location[0], move_location[1], colour)
-        elif piece == "B":
-            self.board_dict[move_location] = Bishop(
-                move_location[0], move_location[1], colour)
-        elif piece == "R":
-            self.board_dict[move_location] = Rook(
-                move_location[0], move_location[1], colour)
+        self._set_square(index, PIECE_TYPES[PROMOTION_KINDS[piece] + offset])
+
+    def pseudo_legal_moves(self, colour: Enum, exclude_castle_moves=False) -> list:
+        # every (piece_location, move_location) pair for colour, in the same move format as get_valid_moves,
+        # generated from the bitboards rather than piece by piece
+        moves = []
+        side = colour.value
+        bitboards = self.bitboards
+        occupied = self.occupancy[0]
+        own = self.occupancy[side]
+        targets_mask = ~own & FULL_BOARD
+        enemy = occupied ^ own
+        offset = 6 if side == 2 else 0
+
+        # pawns; the lookups are push_moves inlined a rank at a time, with push_moves only called to fill in a
+        # missing entry
+        pawns = bitboards[offset]
+        empty = ~occupied & FULL_BOARD
+        if side == 1:
+            single = (pawns >> 8) & empty
+            pushes = [(single, 24), (((single & RANK_MASKS[5]) >> 8) & empty, 32),
+                      (((pawns & NOT_FILE_MASKS[0]) >> 9) & enemy, 25),
+                      (((pawns & NOT_FILE_MASKS[7]) >> 7) & enemy, 23)]
+        else:
+            single = (pawns << 8) & empty
+            pushes = [(single, 8), (((single & RANK_MASKS[2]) << 8) & empty, 0),
+                      (((pawns & NOT_FILE_MASKS[0]) << 7) & enemy, 9),
+                      (((pawns & NOT_FILE_MASKS[7]) << 9) & enemy, 7)]
+        cached_moves = _PUSH_MOVES
+        for targets, distance in pushes:
+            # distance is kept + 16, as in the keys
+            while targets:
+                shift = (targets & -targets).bit_length() - 1 & 56
+                row = targets >> shift & 255
+                targets ^= row << shift
+                moves += cached_moves.get((row << 6 | shift) << 6 | distance) or push_moves(row << shift, distance - 16)
+        # en passant, if the opponent's last move was a two square pawn push
+        if self.en_passant_file is not None and self.squares[self.final_pos[0] + 8 * self.final_pos[1]].side != side:
+            dir_factor = -1 if side == 1 else 1
+            target = (self.final_pos[0], self.final_pos[1] + dir_factor)
+            capturers = PAWN_ATTACKS[3 - side][target[0] + 8 * target[1]] & pawns
+            while capturers:
+                low = capturers & -capturers
+                moves.append((SQUARES[low.bit_length() - 1],
+                              (target[0], target[1], dir_factor)))
+                capturers ^= low
+
+        # knights, bishops, rooks and queens; the lookups below are target_moves, bishop_attacks and
+        # rook_attacks inlined, with those functions only called to fill in a missing entry
+        cached_moves = _TARGET_MOVES
+        remaining = bitboards[offset + 1]
+        while remaining:
+            low = remaining & -remaining
+            square = low.bit_length() - 1
+            targets = KNIGHT_ATTACKS[square] & targets_mask
+            moves += cached_moves.get(targets << 6 | square) or target_moves(square, targets)
+            remaining ^= low
+        cached_attacks = _BISHOP_ATTACKS
+        diagonal = bitboards[offset + 2] | bitboards[offset + 4]
+        while diagonal:
+            low = diagonal & -diagonal
+            square = low.bit_length() - 1
+            targets = (cached_attacks.get((occupied & BISHOP_MASKS[square]) << 6 | square)
+                       or bishop_attacks(square, occupied)) & targets_mask
+            moves += cached_moves.get(targets << 6 | square) or target_moves(square, targets)
+            diagonal ^= low
+        cached_attacks = _ROOK_ATTACKS
+        orthogonal = bitboards[offset + 3] | bitboards[offset + 4]
+        while orthogonal:
+            low = orthogonal & -orthogonal
+            square = low.bit_length() - 1
+            targets = (cached_attacks.get((occupied & ROOK_MASKS[square]) << 6 | square)
+                       or rook_attacks(square, occupied)) & targets_mask
+            moves += cached_moves.get(targets << 6 | square) or target_moves(square, targets)
+            orthogonal ^= low
+        # king
+        remaining = bitboards[offset + 5]
+        while remaining:
+            low = remaining & -remaining
+            square = low.bit_length() - 1
+            targets = KING_ATTACKS[square] & targets_mask
+            moves += cached_moves.get(targets << 6 | square) or target_moves(square, targets)
+            if not exclude_castle_moves:
+                can_queenside, can_kingside = self._castling(side)
+                if can_queenside:
+                    moves.append((SQUARES[square], ("Queenside",)))
+                if can_kingside:
+                    moves.append((SQUARES[square], ("Kingside",)))
+            remaining ^= low
+        return moves
+
+    def iter_pseudo_legal_moves(self, colour: Enum, exclude_castle_moves=False):
+        # the moves of pseudo_legal_moves one at a time, captures and promotions first, then quiet moves and
+        # castling last, so a caller that stops early never generates the rest
+        side = colour.value
+        bitboards = self.bitboards
+        occupied = self.occupancy[0]
+        own = self.occupancy[side]
+        enemy = occupied ^ own
+        empty = ~occupied & FULL_BOARD
+        offset = 6 if side == 2 else 0
+
+        pawns = bitboards[offset]
+        if side == 1:
+            single = (pawns >> 8) & empty
+            promotions = single & RANK_MASKS[0]
+            yield from push_moves(((pawns & NOT_FILE_MASKS[0]) >> 9) & enemy, 9)
+            yield from push_moves(((pawns & NOT_FILE_MASKS[7]) >> 7) & enemy, 7)
+            yield from push_moves(promotions, 8)
         else:
-            self.board_dict[move_location] = Queen(
-                move_location[0], move_location[1], colour)
-        return
+            single = (pawns << 8) & empty
+            promotions = single & RANK_MASKS[7]
+            yield from push_moves(((pawns & NOT_FILE_MASKS[0]) << 7) & enemy, -7)
+            yield from push_moves(((pawns & NOT_FILE_MASKS[7]) << 9) & enemy, -9)
+            yield from push_moves(promotions, -8)
+        if self.en_passant_file is not None and self.squares[self.final_pos[0] + 8 * self.final_pos[1]].side != side:
+            dir_factor = -1 if side == 1 else 1
+            target = (self.final_pos[0], self.final_pos[1] + dir_factor)
+            capturers = PAWN_ATTACKS[3 - side][target[0] + 8 * target[1]] & pawns
+            while capturers:
+                low = capturers & -capturers
+                yield SQUARES[low.bit_length() - 1], (target[0], target[1], dir_factor)
+                capturers ^= low
+
+        # (square, attacked squares) for every other piece, captures from each first
+        attacks = []
+        remaining = bitboards[offset + 1]
+        while remaining:
+            low = remaining & -remaining
+            square = low.bit_length() - 1
+            attacks.append((square, KNIGHT_ATTACKS[square]))
+            remaining ^= low
+        remaining = bitboards[offset + 2] | bitboards[offset + 3] | bitboards[offset + 4]
+        while remaining:
+            low = remaining & -remaining
+            square = low.bit_length() - 1
+            targets = 0
+            if low & (bitboards[offset + 2] | bitboards[offset + 4]):
+                targets = bishop_attacks(square, occupied)
+            if low & (bitboards[offset + 3] | bitboards[offset + 4]):
+                targets |= rook_attacks(square, occupied)
+            attacks.append((square, targets))
+            remaining ^= low
+        remaining = bitboards[offset + 5]
+        while remaining:
+            low = remaining & -remaining
+            square = low.bit_length() - 1
+            attacks.append((square, KING_ATTACKS[square]))
+            remaining ^= low
+        for square, targets in attacks:
+            yield from target_moves(square, targets & enemy)
+
+        if side == 1:
+            yield from push_moves(single ^ promotions, 8)
+            yield from push_moves(((single & RANK_MASKS[5]) >> 8) & empty, 16)
+        else:
+            yield from push_moves(single ^ promotions, -8)
+            yield from push_moves(((single & RANK_MASKS[2]) << 8) & empty, -16)
+        for square, targets in attacks:
+            yield from target_moves(square, targets & empty)
+        if not exclude_castle_moves and bitboards[offset + 5]:
+            king = SQUARES[bitboards[offset + 5].bit_length() - 1]
+            can_queenside, can_kingside = self._castling(side)
+            if can_queenside:
+                yield king, ("Queenside",)
+            if can_kingside:
+                yield king, ("Kingside",)
+
+    def iter_legal_moves(self, colour: Enum):
+        # legal_moves one at a time in iter_pseudo_legal_moves' order, checking each against the same masks
+        side = colour.value
+        if not self.bitboards[5 if side == 1 else 11]:
+            yield from self.iter_pseudo_legal_moves(colour)
+            return
+        king, checkers, mask, pins = self._checks_and_pins(side)
+        occupied = self.occupancy[0] ^ (1 << king)
+        for piece_location, move_location in self.iter_pseudo_legal_moves(colour, bool(checkers)):
+            if len(move_location) == 1:
+                yield piece_location, move_location
+                continue
+            from_index = piece_location[0] + 8 * piece_location[1]
+            to_index = move_location[0] + 8 * move_location[1]
+            if from_index == king:
+                legal = not self._attacked(to_index, 3 - side, occupied)
+            elif len(move_location) == 3 and move_location[2] not in PROMOTION_KINDS:
+                legal = self._en_passant_legal(side, king, checkers, from_index, to_index)
+            else:
+                legal = (mask & pins.get(from_index, FULL_BOARD)) >> to_index & 1
+            if legal:
+                yield piece_location, move_location
+
+    def cached_legal_moves(self, colour: Enum) -> tuple:
+        # legal_moves through Board.move_cache; the key tells the colours apart since a position can be asked about
+        # for either side
+        key = self.key << 1 | (colour.value - 1)
+        moves = self.move_cache.get(key)
+        if moves is None:
+            moves = self.packed_legal_moves(colour)
+            self.move_cache.put(key, moves)
+        unpacked = _UNPACKED_MOVES
+        return tuple(unpacked.get(move) or unpack_move(move) for move in moves)
 
     def filter_moves(self, moves_lst, piece_location):
-        filtered = []
-        colour = self.board_dict[piece_location].colour
-        for move in moves_lst:
-            temp_board = self.deepcopy()
-            temp_board.make_move((piece_location[0], piece_location[1]), move)
-            if not temp_board.in_check(colour):
-                filtered.append(move)
-        return filtered
+        colour = self.squares[piece_location[0] + 8 * piece_location[1]].colour
+        legal = [move for location, move in self.cached_legal_moves(
+            colour) if location == piece_location]
+        return [move for move in moves_lst if move in legal]
 
-    def is_checkmate(self, colour):
-        copy_board = self.deepcopy()
-        for piece in self.board_dict:
-            if self.board_dict[piece].colour == colour:
-                moves = self.filter_moves(self.board_dict[piece].get_valid_moves(
-                    copy_board, self.last_moved, self.initial_pos, self.final_pos, exclude_castle_moves=True), (self.board_dict[piece].x, self.board_dict[piece].y))
-                if len(moves) > 0:
-                    return False
+    def _checks_and_pins(self, side: int) -> tuple:
+        # (king, checkers, mask, pins) for colour value side: the king's bit index, the pieces giving check, the
+        # squares a move other than the king's has to land on (anywhere, the check's line, or nowhere in double
+        # check), and for each pinned piece the squares between the king and the pinning piece, that one included
+        bitboards = self.bitboards
+        offset = 6 if side == 2 else 0
+        enemy = 6 - offset
+        king = bitboards[offset + 5].bit_length() - 1
+        occupied = self.occupancy[0]
+        # a pawn of side on the king's square attacks exactly the squares enemy pawns attack the king from
+        checkers = KNIGHT_ATTACKS[king] & bitboards[enemy + 1] | PAWN_ATTACKS[side][king] & bitboards[enemy]
+        # enemy sliders that would reach the king if none of side's pieces were in the way
+        enemy_only = occupied ^ self.occupancy[side]
+        queens = bitboards[enemy + 4]
+        snipers = bishop_attacks(king, enemy_only) & (bitboards[enemy + 2] | queens) | \
+            rook_attacks(king, enemy_only) & (bitboards[enemy + 3] | queens)
+        pins = {}
+        while snipers:
+            low = snipers & -snipers
+            line = BETWEEN[king << 6 | low.bit_length() - 1]
+            blockers = line & occupied
+            if not blockers:
+                checkers |= low
+            elif blockers & (blockers - 1) == 0:
+                pins[blockers.bit_length() - 1] = line | low
+            snipers ^= low
+        if not checkers:
+            mask = FULL_BOARD
+        elif checkers & (checkers - 1):
+            mask = 0
+        else:
+            mask = checkers | BETWEEN[king << 6 | checkers.bit_length() - 1]
+        return king, checkers, mask, pins
+
+    def _en_passant_legal(self, side: int, king: int, checkers: int, from_index: int, to_index: int) -> bool:
+        # two pawns leave the board at once, which can uncover a slider on the king's rank or diagonal, so the
+        # slider lookups are redone with the board as it will be after the capture
+        offset = 0 if side == 2 else 6
+        captured = 1 << (to_index + (8 if side == 1 else -8))
+        bitboards = self.bitboards
+        if checkers & ~captured & (bitboards[offset] | bitboards[offset + 1]):
+            return False
+        occupied = self.occupancy[0] ^ (1 << from_index) ^ captured | 1 << to_index
+        queens = bitboards[offset + 4]
+        return not bishop_attacks(king, occupied) & (bitboards[offset + 2] | queens) and \
+            not rook_attacks(king, occupied) & (bitboards[offset + 3] | queens)
+
+    def legal_moves(self, colour: Enum) -> list:
+        # every legal (piece_location, move_location) pair for colour
+        unpacked = _UNPACKED_MOVES
+        return [unpacked.get(move) or unpack_move(move) for move in self.packed_legal_moves(colour)]
+
+    def packed_legal_moves(self, colour: Enum) -> array:
+        # every legal move for colour, packed, with no moves tried out: targets are cut down to the squares that
+        # answer a check and pinned pieces to their pin lines, leaving attack lookups for the king's own moves and
+        # en passant
+        side = colour.value
+        bitboards = self.bitboards
+        offset = 6 if side == 2 else 0
+        if not bitboards[offset + 5]:
+            return array("H", [self.pack(*move) for move in self.pseudo_legal_moves(colour)])
+        king, checkers, mask, pins = self._checks_and_pins(side)
+        moves = array("H")
+        occupied = self.occupancy[0]
+        own = self.occupancy[side]
+        enemy = occupied ^ own
+        empty = ~occupied & FULL_BOARD
+        captures_mask = enemy & mask
+        quiet_mask = empty & mask
+        if mask:
+            pinned = 0
+            for square in pins:
+                pinned |= 1 << square
+            # pawns, with the pinned ones one at a time along their pin lines
+            all_pawns = bitboards[offset]
+            groups = [(all_pawns & ~pinned, mask)]
+            for square, line in pins.items():
+                if all_pawns >> square & 1:
+                    groups.append((1 << square, line & mask))
+            for pawns, allowed in groups:
+                if side == 1:
+                    single = (pawns >> 8) & empty
+                    add_push_moves(moves, single & allowed, 8, 0)
+                    add_push_moves(moves, ((single & RANK_MASKS[5]) >> 8) & empty & allowed, 16, 0)
+                    add_push_moves(moves, ((pawns & NOT_FILE_MASKS[0]) >> 9) & enemy & allowed, 9, MOVE_CAPTURE)
+                    add_push_moves(moves, ((pawns & NOT_FILE_MASKS[7]) >> 7) & enemy & allowed, 7, MOVE_CAPTURE)
+                else:
+                    single = (pawns << 8) & empty
+                    add_push_moves(moves, single & allowed, -8, 0)
+                    add_push_moves(moves, ((single & RANK_MASKS[2]) << 8) & empty & allowed, -16, 0)
+                    add_push_moves(moves, ((pawns & NOT_FILE_MASKS[0]) << 7) & enemy & allowed, -7,
+                                               MOVE_CAPTURE)
+                    add_push_moves(moves, ((pawns & NOT_FILE_MASKS[7]) << 9) & enemy & allowed, -9,
+                                               MOVE_CAPTURE)
+            if self.en_passant_file is not None and \
+                    self.squares[self.final_pos[0] + 8 * self.final_pos[1]].side != side:
+                to_index = self.final_pos[0] + 8 * self.final_pos[1] + (-8 if side == 1 else 8)
+                capturers = PAWN_ATTACKS[3 - side][to_index] & all_pawns
+                while capturers:
+                    low = capturers & -capturers
+                    if self._en_passant_legal(side, king, checkers, low.bit_length() - 1, to_index):
+                        moves.append(low.bit_length() - 1 | to_index << 6 | (MOVE_EN_PASSANT | MOVE_CAPTURE) << 12)
+                    capturers ^= low
+
+            # a pinned knight can never move; pinned sliders keep to their lines
+            cached_moves = _PACKED_TARGET_MOVES
+            remaining = bitboards[offset + 1] & ~pinned
+            while remaining:
+                low = remaining & -remaining
+                square = low.bit_length() - 1
+                attacks = KNIGHT_ATTACKS[square]
+                captures = attacks & captures_mask
+                quiet = attacks & quiet_mask
+                moves += cached_moves.get((captures << 64 | quiet) << 6 | square) or \
+                    packed_target_moves(square, captures, quiet)
+                remaining ^= low
+            cached_attacks = _BISHOP_ATTACKS
+            diagonal = bitboards[offset + 2] | bitboards[offset + 4]
+            while diagonal:
+                low = diagonal & -diagonal
+                square = low.bit_length() - 1
+                attacks = cached_attacks.get((occupied & BISHOP_MASKS[square]) << 6 | square) or \
+                    bishop_attacks(square, occupied)
+                if low & pinned:
+                    attacks &= pins[square]
+                captures = attacks & captures_mask
+                quiet = attacks & quiet_mask
+                moves += cached_moves.get((captures << 64 | quiet) << 6 | square) or \
+                    packed_target_moves(square, captures, quiet)
+                diagonal ^= low
+            cached_attacks = _ROOK_ATTACKS
+            orthogonal = bitboards[offset + 3] | bitboards[offset + 4]
+            while orthogonal:
+                low = orthogonal & -orthogonal
+                square = low.bit_length() - 1
+                attacks = cached_attacks.get((occupied & ROOK_MASKS[square]) << 6 | square) or \
+                    rook_attacks(square, occupied)
+                if low & pinned:
+                    attacks &= pins[square]
+                captures = attacks & captures_mask
+                quiet = attacks & quiet_mask
+                moves += cached_moves.get((captures << 64 | quiet) << 6 | square) or \
+                    packed_target_moves(square, captures, quiet)
+                orthogonal ^= low
+
+        # the king, looking through its own square so it can't step back along a slider's line
+        remaining = KING_ATTACKS[king] & ~own
+        without_king = occupied ^ (1 << king)
+        targets = 0
+        while remaining:
+            low = remaining & -remaining
+            if not self._attacked(low.bit_length() - 1, 3 - side, without_king):
+                targets |= low
+            remaining ^= low
+        moves += packed_target_moves(king, targets & enemy, targets & empty)
+        if not checkers:
+            can_queenside, can_kingside = self._castling(side)
+            if can_queenside:
+                moves.append(king | (king - 2) << 6 | MOVE_QUEENSIDE << 12)
+            if can_kingside:
+                moves.append(king | (king + 2) << 6 | MOVE_KINGSIDE << 12)
+        return moves
+
+    def has_legal_move(self, colour):
+        moves = self.move_cache.get(self.key << 1 | (colour.value - 1))
+        if moves is not None:
+            return len(moves) > 0
+        # stop at the first legal move rather than working out all of them
+        return next(self.iter_legal_moves(colour), None) is not None
+
+    def repetition_count(self) -> int:
+        # how many times the current position has come up, this time included
+        return self.repetitions.get(self.key, 0)
+
+    def has_insufficient_material(self) -> bool:
+        # no pawns, rooks or queens, and at most one knight, or only bishops that are all on one colour of square
+        bitboards = self.bitboards
+        if bitboards[0] | bitboards[6] | bitboards[3] | bitboards[9] | bitboards[4] | bitboards[10]:
+            return False
+        knights = bitboards[1] | bitboards[7]
+        bishops = bitboards[2] | bitboards[8]
+        if knights:
+            return not bishops and knights & (knights - 1) == 0
+        return not bishops & DARK_SQUARES or not bishops & ~DARK_SQUARES
+
+    def draw_status(self):
+        # the draws that don't depend on the legal moves, or None; each is a lookup rather than a search
+        if self.has_insufficient_material():
+            return GameStatus.INSUFFICIENT_MATERIAL
+        count = self.repetitions.get(self.key, 0)
+        if count >= 5:
+            return GameStatus.FIVEFOLD_REPETITION
+        if count >= 3:
+            return GameStatus.THREEFOLD_REPETITION
+        return None
+
+    def game_status(self, colour: Enum):
+        # the state of the game when it is colour's turn to move
+        status = self.draw_status()
+        if status is not None:
+            return status
+        if self.has_legal_move(colour):
+            # checkmate on the hundredth move still wins, so the fifty move rule comes after looking for moves
+            return GameStatus.FIFTY_MOVE_RULE if self.halfmove_clock >= 100 else GameStatus.ONGOING
         if self.in_check(colour):
-            return True
-        return False
+            return GameStatus.CHECKMATE
+        return GameStatus.STALEMATE
 
-    def is_draw(self, colour):
-        copy_board = self.deepcopy()
-        for piece in self.board_dict:
-            if self.board_dict[piece].colour == colour:
-                moves = self.filter_moves(self.board_dict[piece].get_valid_moves(
-                    copy_board, self.last_moved, self.initial_pos, self.final_pos, exclude_castle_moves=True), (self.board_dict[piece].x, self.board_dict[piece].y))
-                if len(moves) > 0:
-                    return False
-
-        if not self.in_check(colour):
-            return True
+    def is_checkmate(self, colour):
+        return self.game_status(colour) == GameStatus.CHECKMATE
 
-        return False
+    def is_draw(self, colour):
+        return self.game_status(colour) in DRAWS
@@ -0,0 +1,110 @@
+import argparse
+import mmap
+import random
+import struct
+import time
+from collections import Counter
+
+from board_and_pieces import Board, unpack_move
+from pgn import parse_san, read_games, start_board
+
+# An opening book: the moves played from each position, with how often, sorted by the position's Zobrist key so
+# a probe is a binary search. The file is memory mapped, so processes sharing it share one page-cached copy.
+MAGIC = b"CHESSBK1"
+# key, packed move, weight
+ENTRY = struct.Struct("<QHH")
+MAX_WEIGHT = 0xFFFF
+
+
+def count_moves(games, max_plies=20) -> Counter:
+    # (key, packed move) -> times played, over the first max_plies of each game
+    counts = Counter()
+    for game in games:
+        board = start_board(game)
+        for san in game.moves[:max_plies]:
+            try:
+                move = board.pack(*parse_san(board, san, board.turn))
+            except ValueError:
+                break
+            counts[(board.key, move)] += 1
+            board.push_move(move)
+    return counts
+
+
+def write(path: str, counts: Counter) -> int:
+    entries = sorted(counts.items())
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        for (key, move), weight in entries:
+            file.write(ENTRY.pack(key, move, min(weight, MAX_WEIGHT)))
+    return len(entries)
+
+
+class OpeningBook:
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC or (len(self.data) - len(MAGIC)) % ENTRY.size:
+            self.data.close()
+            raise ValueError("%s is not an opening book" % path)
+        self.entries = (len(self.data) - len(MAGIC)) // ENTRY.size
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def _key(self, entry: int) -> int:
+        return ENTRY.unpack_from(self.data, len(MAGIC) + entry * ENTRY.size)[0]
+
+    def packed_moves(self, key: int) -> list:
+        # (packed move, weight) for every move stored for the position with Zobrist key key
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        while low < self.entries:
+            entry_key, move, weight = ENTRY.unpack_from(self.data, len(MAGIC) + low * ENTRY.size)
+            if entry_key != key:
+                break
+            moves.append((move, weight))
+            low += 1
+        return moves
+
+    def moves(self, board: Board) -> list:
+        # ((piece_location, move_location), weight) for board's position, most played first
+        moves = sorted(self.packed_moves(board.key), key=lambda entry: -entry[1])
+        return [(unpack_move(move), weight) for move, weight in moves]
+
+    def choose(self, board: Board, rng=random):
+        # a book move for board picked in proportion to how often it was played, or None when out of book. Moves
+        # that aren't legal on board (from a position whose key clashes with this one's) are left out.
+        legal = board.cached_legal_moves(board.turn)
+        moves = [(move, weight) for move, weight in self.moves(board) if move in legal]
+        if not moves:
+            return None
+        return rng.choices([move for move, weight in moves], [weight for move, weight in moves])[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book from the games in a PGN file.")
+    parser.add_argument("pgn", help="PGN file to read")
+    parser.add_argument("output", help="file to write the book to")
+    parser.add_argument("--plies", type=int, default=20, help="plies of each game to add to the book")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.pgn, encoding="utf-8", errors="replace") as file:
+        count = write(args.output, count_moves(read_games(file), args.plies))
+    print("%d entries in %.3fs" % (count, time.perf_counter() - start))
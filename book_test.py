@@ -0,0 +1,64 @@
+import io
+import random
+
+import pytest
+
+from book import OpeningBook, count_moves, write
+from board_and_pieces import Board, Colour, pack_move
+from pgn import read_games
+from search import best_move
+
+GAMES = """[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 1-0
+
+[Result "0-1"]
+
+1. e4 c5 2. Nf3 d6 0-1
+
+[Result "1/2-1/2"]
+
+1. d4 d5 2. c4 e6 1/2-1/2
+
+[Result "*"]
+
+1. e4 e5 2. Bc4 *
+"""
+
+
+def test_book(tmp_path):
+    counts = count_moves(read_games(io.StringIO(GAMES)), max_plies=3)
+    path = str(tmp_path / "book.bin")
+    assert write(path, counts) == len(counts) == 9
+    with OpeningBook(path) as book:
+        assert len(book) == 9
+        board = Board()
+        assert book.moves(board) == [(((4, 6), (4, 4)), 3), (((3, 6), (3, 4)), 1)]
+        board.make_move((4, 6), (4, 4))
+        assert sorted(book.moves(board)) == [(((2, 1), (2, 3)), 1), (((4, 1), (4, 3)), 2)]
+        board.make_move((4, 1), (4, 3))
+        assert sorted(book.moves(board)) == [(((5, 7), (2, 4)), 1), (((6, 7), (5, 5)), 1)]
+        # only three plies of each game went in
+        board.make_move((6, 7), (5, 5))
+        assert book.moves(board) == []
+        assert book.choose(board) is None
+        assert book.choose(Board(), random.Random(1)) in [((4, 6), (4, 4)), ((3, 6), (3, 4))]
+        # in book the search isn't needed, out of book it is
+        assert best_move(Board(), Colour.WHITE, 0, book=book) in [((4, 6), (4, 4)), ((3, 6), (3, 4))]
+        assert best_move(board, Colour.BLACK, 200, book=book) in board.legal_moves(Colour.BLACK)
+
+
+def test_illegal_book_move(tmp_path):
+    # an entry under the starting position's key that can't be played there, as a key clash would leave
+    path = str(tmp_path / "book.bin")
+    write(path, {(Board().key, pack_move((4, 6), (4, 3))): 5})
+    with OpeningBook(path) as book:
+        assert book.choose(Board()) is None
+        assert best_move(Board(), Colour.WHITE, 200, book=book) in Board().legal_moves(Colour.WHITE)
+
+
+def test_not_a_book(tmp_path):
+    path = tmp_path / "book.bin"
+    path.write_bytes(b"not a book")
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
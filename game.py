@@ -0,0 +1,56 @@
+from board_and_pieces import Board, Colour, GameStatus
+
+
+class Game:
+    # A game played through code rather than at the keyboard: moves go in as (piece_location, move_location) pairs
+    # from legal_moves, promotions included, and nothing ever waits on input.
+    def __init__(self, board=None) -> None:
+        self.board = board if board is not None else Board()
+        # every move played so far, in order
+        self.moves = []
+        self.status = self.board.game_status(self.board.turn)
+
+    @property
+    def turn(self) -> Colour:
+        return self.board.turn
+
+    @property
+    def is_over(self) -> bool:
+        return self.status != GameStatus.ONGOING
+
+    @property
+    def winner(self):
+        # the colour that gave checkmate, or None
+        if self.status != GameStatus.CHECKMATE:
+            return None
+        return Colour.BLACK if self.board.turn == Colour.WHITE else Colour.WHITE
+
+    def legal_moves(self) -> tuple:
+        return self.board.cached_legal_moves(self.board.turn)
+
+    def moves_from(self, piece_location: tuple) -> list:
+        return [move_location for location, move_location in self.legal_moves() if location == piece_location]
+
+    def play(self, piece_location: tuple, move_location: tuple) -> GameStatus:
+        if self.is_over:
+            raise ValueError("the game is over")
+        if (piece_location, move_location) not in self.legal_moves():
+            raise ValueError("illegal move %s to %s" % (piece_location, move_location))
+        self.board.make_move(piece_location, move_location)
+        self.moves.append((piece_location, move_location))
+        self.status = self.board.game_status(self.board.turn)
+        return self.status
+
+    def undo(self) -> tuple:
+        move = self.moves.pop()
+        self.board.pop()
+        self.status = self.board.game_status(self.board.turn)
+        return move
+
+    def play_out(self, choose, max_moves=None) -> GameStatus:
+        # plays choose(game)'s move until the game ends or max_moves more moves have been played
+        played = 0
+        while not self.is_over and (max_moves is None or played < max_moves):
+            self.play(*choose(self))
+            played += 1
+        return self.status
@@ -0,0 +1,57 @@
+import pytest
+
+from board_and_pieces import Board, Colour, GameStatus
+from game import Game
+
+
+def test_play():
+    game = Game()
+    assert game.turn == Colour.WHITE
+    assert len(game.legal_moves()) == 20
+    assert game.moves_from((6, 7)) == [(5, 5), (7, 5)]
+    # fool's mate
+    for move in [((5, 6), (5, 5)), ((4, 1), (4, 3)), ((6, 6), (6, 4))]:
+        assert game.play(*move) == GameStatus.ONGOING
+    with pytest.raises(ValueError):
+        game.play((3, 0), (3, 3))
+    assert game.play((3, 0), (7, 4)) == GameStatus.CHECKMATE
+    assert game.is_over
+    assert game.winner == Colour.BLACK
+    with pytest.raises(ValueError):
+        game.play((0, 6), (0, 5))
+    assert game.undo() == ((3, 0), (7, 4))
+    assert not game.is_over
+    assert game.winner is None
+
+
+def test_promotion_moves():
+    game = Game(Board.from_fen("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1"))
+    # a push and a capture, each with four pieces to choose from
+    assert sorted(game.moves_from((0, 1))) == sorted([(0, 0, piece) for piece in "QRBN"] +
+                                                     [(1, 0, piece) for piece in "QRBN"])
+    game.play((0, 1), (1, 0, "N"))
+    assert game.board.squares[1].kind == 1
+    game.undo()
+    game.play((0, 1), (0, 0, "R"))
+    assert game.board.squares[0].kind == 3
+
+
+def test_play_out():
+    game = Game()
+    # always the first legal move; the game either ends or runs out of moves
+    status = game.play_out(lambda game: game.legal_moves()[0], max_moves=40)
+    assert len(game.moves) == 40 or status != GameStatus.ONGOING
+    # scholar's mate
+    moves = iter([((4, 6), (4, 4)), ((4, 1), (4, 3)), ((5, 7), (2, 4)), ((1, 0), (2, 2)),
+                  ((3, 7), (7, 3)), ((6, 0), (5, 2)), ((7, 3), (5, 1))])
+    game = Game()
+    assert game.play_out(lambda game: next(moves)) == GameStatus.CHECKMATE
+    assert game.winner == Colour.WHITE
+
+
+def test_play_out_ends_in_repetition():
+    moves = iter([((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (6, 7)), ((5, 2), (6, 0))] * 3)
+    game = Game()
+    assert game.play_out(lambda game: next(moves)) == GameStatus.THREEFOLD_REPETITION
+    assert len(game.moves) == 8
+    assert game.winner is None
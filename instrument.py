@@ -0,0 +1,129 @@
+import argparse
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from board_and_pieces import Bishop, Board, King, Knight, Pawn, Queen, Rook
+
+# Methods timed while instrumentation is on. Nothing is wrapped until enable() is called, and disable() puts the
+# original functions back, so an uninstrumented run pays nothing at all.
+TARGETS = [(Pawn, "get_valid_moves"), (Knight, "get_valid_moves"), (Bishop, "get_valid_moves"),
+           (Rook, "get_valid_moves"), (Queen, "get_valid_moves"), (King, "get_valid_moves"),
+           (King, "can_castle"), (Board, "filter_moves"), (Board, "in_check"), (Board, "deepcopy"),
+           (Board, "make_move"), (Board, "push"), (Board, "push_move"), (Board, "pop"), (Board, "legal_moves"),
+           (Board, "packed_legal_moves"), (Board, "pseudo_legal_moves"), (Board, "_castling"),
+           (Board, "has_legal_move"), (Board, "game_status")]
+
+_originals = {}
+# name -> [calls, total seconds, seconds not spent in other timed calls]
+_stats = defaultdict(lambda: [0, 0.0, 0.0])
+# "outer;inner" call path -> seconds spent in the innermost call itself, for flame graphs
+_stacks = defaultdict(float)
+# [path, seconds spent in timed calls made from here] for every timed call in progress, a stack per thread so
+# calls in worker threads (the server's status checks) don't nest inside each other; the totals above are shared
+# and updated under _lock
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def _frames() -> list:
+    frames = getattr(_local, "frames", None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+def _timed(name: str, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        frames = _frames()
+        parent = frames[-1] if frames else None
+        frame = [parent[0] + ";" + name if parent is not None else name, 0.0]
+        frames.append(frame)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            frames.pop()
+            if parent is not None:
+                parent[1] += elapsed
+            with _lock:
+                stats = _stats[name]
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] += elapsed - frame[1]
+                _stacks[frame[0]] += elapsed - frame[1]
+    return wrapper
+
+
+def enabled() -> bool:
+    return bool(_originals)
+
+
+def enable() -> None:
+    if enabled():
+        return
+    for cls, attribute in TARGETS:
+        function = cls.__dict__[attribute]
+        _originals[(cls, attribute)] = function
+        setattr(cls, attribute, _timed("%s.%s" % (cls.__name__, attribute), function))
+
+
+def disable() -> None:
+    for (cls, attribute), function in _originals.items():
+        setattr(cls, attribute, function)
+    _originals.clear()
+    _frames().clear()
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _stacks.clear()
+
+
+@contextmanager
+def instrumented():
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+
+
+def stats() -> dict:
+    # name -> (calls, total seconds, own seconds)
+    return {name: tuple(values) for name, values in _stats.items()}
+
+
+def report() -> str:
+    lines = ["%-28s %10s %10s %10s %10s" % ("call", "calls", "total s", "own s", "us/call")]
+    for name, (calls, total, own) in sorted(_stats.items(), key=lambda item: -item[1][1]):
+        lines.append("%-28s %10d %10.3f %10.3f %10.2f" % (name, calls, total, own, total / calls * 1e6))
+    return "\n".join(lines)
+
+
+def dump_stacks(file) -> None:
+    # one "outer;inner microseconds" line per call path, the folded format flamegraph.pl and speedscope read
+    for path, seconds in sorted(_stacks.items()):
+        file.write("%s %d\n" % (path, round(seconds * 1e6)))
+
+
+if __name__ == "__main__":
+    from perft import POSITIONS, perft
+
+    parser = argparse.ArgumentParser(description="Run perft with instrumentation on and report where time went.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--position", choices=sorted(POSITIONS), default="kiwipete")
+    parser.add_argument("--folded", help="file to write folded stacks to, for a flame graph")
+    args = parser.parse_args()
+
+    with instrumented():
+        perft(Board.from_fen(POSITIONS[args.position][0]), args.depth)
+    print(report())
+    if args.folded:
+        with open(args.folded, "w") as file:
+            dump_stacks(file)
@@ -0,0 +1,97 @@
+import io
+import sys
+import threading
+
+import instrument
+from board_and_pieces import Board, Colour
+from perft import perft
+
+
+def test_instrumented():
+    push = Board.push
+    instrument.reset()
+    Board.move_cache.clear()
+    with instrument.instrumented():
+        assert instrument.enabled()
+        assert Board.push is not push
+        board = Board()
+        assert perft(board, 2) == 400
+        board.board_dict[(1, 7)].get_valid_moves(board, None, None, None)
+        board.filter_moves([(0, 5), (2, 5)], (1, 7))
+        board.make_move((4, 6), (4, 4))
+        board.deepcopy()
+        board.game_status(Colour.BLACK)
+    # everything is back as it was
+    assert not instrument.enabled()
+    assert Board.push is push
+    stats = instrument.stats()
+    # legal moves aren't tried out, so only perft's 20 and the one make_move
+    assert stats["Board.push_move"][0] == 21
+    assert stats["Board.push"][0] == 1
+    assert stats["Board.packed_legal_moves"][0] == 1 + 20 + 1
+    # castling is worked out once for every position whose moves are generated
+    assert stats["Board._castling"][0] == 1 + 20 + 1
+    assert stats["Board.has_legal_move"][0] == 1
+    assert stats["Board.make_move"][0] == 1
+    assert stats["Knight.get_valid_moves"][0] == 1
+    assert stats["Board.deepcopy"][0] == 1
+    calls, total, own = stats["Board.filter_moves"]
+    assert 0 < own < total
+    calls = stats["Board.packed_legal_moves"][0]
+    report = instrument.report()
+    assert "Board.packed_legal_moves" in report and "Knight.get_valid_moves" in report
+    # nothing is counted while it is off
+    Board().legal_moves(Colour.WHITE)
+    assert instrument.stats()["Board.packed_legal_moves"][0] == calls
+
+
+def test_dump_stacks():
+    instrument.reset()
+    Board.move_cache.clear()
+    with instrument.instrumented():
+        board = Board()
+        board.filter_moves([(0, 5)], (1, 7))
+        board.make_move((1, 7), (0, 5))
+        board.game_status(Colour.BLACK)
+    out = io.StringIO()
+    instrument.dump_stacks(out)
+    paths = {}
+    for line in out.getvalue().splitlines():
+        path, micros = line.rsplit(" ", 1)
+        paths[path] = int(micros)
+    assert "Board.filter_moves" in paths
+    assert "Board.filter_moves;Board.packed_legal_moves" in paths
+    assert "Board.make_move;Board.push;Board.push_move" in paths
+    assert "Board.game_status;Board.has_legal_move" in paths
+
+
+def test_threads_keep_their_own_stacks():
+    instrument.reset()
+    Board.move_cache.clear()
+
+    def work():
+        board = Board()
+        for step in range(200):
+            board.in_check(Colour.WHITE)
+            board.packed_legal_moves(Colour.WHITE)
+
+    interval = sys.getswitchinterval()
+    # switch threads as often as possible, so their timed calls overlap
+    sys.setswitchinterval(1e-6)
+    try:
+        with instrument.instrumented():
+            threads = [threading.Thread(target=work) for thread in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    out = io.StringIO()
+    instrument.dump_stacks(out)
+    paths = {line.rsplit(" ", 1)[0] for line in out.getvalue().splitlines()}
+    # the calls the threads made are never nested inside each other
+    assert paths <= {"Board.in_check", "Board.packed_legal_moves", "Board.packed_legal_moves;Board._castling"}
+    assert instrument.stats()["Board.packed_legal_moves"][0] == 800
+    calls, total, own = instrument.stats()["Board.in_check"]
+    assert calls == 800 and 0 < own <= total
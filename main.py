@@ -1,13 +1,12 @@
 from board_and_pieces import *
+from game import Game
 
-board = Board()
-game_over = False
-whites_turn = True
-is_draw = False
-is_checkmate = False
+game = Game()
+board = game.board
 
-while not game_over:
+while not game.is_over:
     print(board)
+    whites_turn = game.turn == Colour.WHITE
     to_move = "\nWhite to move\n-------------\n" if whites_turn else "\nBlack to move\n-------------\n"
     print(to_move)
     # get input and check if valid piece is selected
@@ -15,13 +14,13 @@ while not game_over:
     while not valid_piece:
         y = int(input("Enter row of piece you want to move: "))
         x = int(input("Enter column of piece you want to move: "))
-        if (x, y) in board.board_dict and ((whites_turn and board.board_dict[(x, y)].colour == Colour.WHITE) or (not whites_turn and board.board_dict[(x, y)].colour == Colour.BLACK)) and len(board.filter_moves(board.board_dict[(x, y)].get_valid_moves(board, board.last_moved, board.initial_pos, board.final_pos), (x, y))) > 0:
+        if len(game.moves_from((x, y))) > 0:
             valid_piece = True
         else:
             print("Invalid piece selected. Try again. ")
 
-    moves = board.filter_moves(board.board_dict[(x, y)].get_valid_moves(
-        board, board.last_moved, board.initial_pos, board.final_pos), (x, y))
+    # promotions show up once for each piece, as (x, y, piece)
+    moves = game.moves_from((x, y))
 
     print(moves)
 
@@ -37,25 +36,14 @@ while not game_over:
         else:
             print("Invalid move index. Try again.")
 
-    board.make_move((x, y), moves[index])
-
-    colour = Colour.BLACK if whites_turn else Colour.WHITE
-
-    if board.is_draw(colour):
-        is_draw = True
-        game_over = True
-        break
-    if board.is_checkmate(colour):
-        is_checkmate = True
-        game_over = True
-        break
-
-    whites_turn = not whites_turn
+    game.play((x, y), moves[index])
 
 print(board)
-if is_draw:
+if game.status == GameStatus.STALEMATE:
     print("Stalemate. No one wins.")
+elif game.status in DRAWS:
+    print("Draw by " + game.status.name.lower().replace("_", " ") + ".")
 
-if is_checkmate:
-    colour = "White" if whites_turn else "Black"
+if game.status == GameStatus.CHECKMATE:
+    colour = "White" if game.winner == Colour.WHITE else "Black"
     print("Checkmate. " + colour + " wins.")
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+
+
+class LegalMoveCache:
+    # Legal moves by position, for positions that come up again and again (the same position is checked when a
+    # piece is picked, when its moves are listed and for checkmate and stalemate). Holds at most max_entries
+    # positions and throws out the least recently used one when full; an entry is an array("H") of packed moves,
+    # roughly 80 + 2 bytes per move, so the default budget is in the region of 10MB. Boards in worker threads share
+    # the cache with the main thread, so a lookup and its reordering happen under a lock.
+    def __init__(self, max_entries=65536) -> None:
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: int):
+        with self.lock:
+            moves = self.entries.get(key)
+            if moves is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return moves
+
+    def put(self, key: int, moves) -> None:
+        with self.lock:
+            self.entries[key] = moves
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,63 @@
+import threading
+
+from board_and_pieces import Board
+from board_and_pieces import Colour
+from move_cache import LegalMoveCache
+
+
+def test_lru_eviction():
+    cache = LegalMoveCache(max_entries=2)
+    cache.put(1, ("a",))
+    cache.put(2, ("b",))
+    # using 1 makes 2 the least recently used entry
+    assert cache.get(1) == ("a",)
+    cache.put(3, ("c",))
+    assert len(cache) == 2
+    assert cache.get(2) is None
+    assert cache.get(3) == ("c",)
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_board_uses_cache():
+    original = Board.move_cache
+    Board.move_cache = LegalMoveCache(max_entries=16)
+    try:
+        board = Board()
+        moves = board.filter_moves(board.board_dict[(6, 7)].get_valid_moves(
+            board, board.last_moved, board.initial_pos, board.final_pos), (6, 7))
+        assert set(moves) == set([(5, 5), (7, 5)])
+        assert Board.move_cache.misses == 1
+        # the same position from another board, and the game status checks, are answered from the cache
+        other = Board()
+        other.filter_moves([(2, 5), (1, 5), (0, 5)], (1, 7))
+        assert not other.is_checkmate(Colour.WHITE)
+        assert not other.is_draw(Colour.WHITE)
+        assert Board.move_cache.misses == 1
+        assert Board.move_cache.hits == 3
+        # black's moves in the same position are a separate entry
+        assert not other.is_draw(Colour.BLACK)
+        assert Board.move_cache.misses == 2
+    finally:
+        Board.move_cache = original
+
+
+def test_threads_share_cache():
+    # lookups racing evictions from other threads neither fail nor lose count
+    cache = LegalMoveCache(max_entries=8)
+
+    def work(offset):
+        for step in range(20000):
+            key = (offset + step) % 16
+            if cache.get(key) is None:
+                cache.put(key, (key,))
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache) == 8
+    assert cache.hits + cache.misses == 80000
@@ -0,0 +1,163 @@
+import argparse
+import multiprocessing
+import random
+import time
+
+from board_and_pieces import Board, Colour, unpack_move
+from perft import POSITIONS, perft
+from search import MATE_SCORE, MAX_PLY, Searcher, SearchResult
+
+# Root splitting for perft and search. Workers never see a Board object: each task carries the 33 byte
+# Board.to_bytes() position plus the move counters and the repetition counts (Zobrist keys are the same in every
+# process), and the worker builds its own board from that. Nothing is shared while the workers run.
+
+# perft hands out at least this many tasks per process, going a ply deeper than the root if it has to, so a few
+# big subtrees don't leave the other cores idle at the end
+TASKS_PER_PROCESS = 4
+
+
+def pack(board: Board) -> tuple:
+    return board.to_bytes(), board.halfmove_clock, board.fullmove_number, board.repetitions
+
+
+def unpack(position: tuple) -> Board:
+    data, halfmove_clock, fullmove_number, repetitions = position
+    board = Board.from_bytes(data)
+    board.halfmove_clock = halfmove_clock
+    board.fullmove_number = fullmove_number
+    board.repetitions = dict(repetitions)
+    return board
+
+
+def perft_task(data: bytes, depth: int) -> int:
+    return perft(Board.from_bytes(data), depth)
+
+
+def split(board: Board, depth: int, tasks: int) -> list:
+    # (root move, position, depth left) for every subtree to count, expanding a ply at a time below the root
+    # while there are fewer than tasks of them and each still has more than one ply to go
+    work = []
+    for move in board.packed_legal_moves(board.turn):
+        board.push_move(move)
+        work.append((unpack_move(move), board.to_bytes(), depth - 1))
+        board.pop()
+    while len(work) < tasks and work and work[0][2] > 1:
+        deeper = []
+        for move, data, left in work:
+            child = Board.from_bytes(data)
+            for child_move in child.packed_legal_moves(child.turn):
+                child.push_move(child_move)
+                deeper.append((move, child.to_bytes(), left - 1))
+                child.pop()
+        work = deeper
+    return work
+
+
+def divide(board: Board, depth: int, processes=None) -> dict:
+    # perft.divide with the subtrees counted on every core
+    if depth < 2:
+        return {move: 1 for move in board.legal_moves(board.turn)} if depth == 1 else {}
+    processes = processes or multiprocessing.cpu_count()
+    work = split(board, depth, processes * TASKS_PER_PROCESS)
+    counts = {move: 0 for move in board.legal_moves(board.turn)}
+    with multiprocessing.Pool(processes) as pool:
+        # chunksize 1 so whichever worker is free takes the next subtree
+        for move, nodes in zip([move for move, data, left in work],
+                               pool.starmap(perft_task, [(data, left) for move, data, left in work], 1)):
+            counts[move] += nodes
+    return counts
+
+
+def parallel_perft(board: Board, depth: int, processes=None) -> int:
+    if depth < 2:
+        return perft(board, depth)
+    return sum(divide(board, depth, processes).values())
+
+
+def search_task(position: tuple, colour_value: int, moves: list, time_ms, max_nodes, max_depth, seed) -> SearchResult:
+    board = unpack(position)
+    if seed:
+        # helpers in a lazy SMP search try equal moves in a different order, so they don't all walk the same tree
+        random.Random(seed).shuffle(moves)
+    return Searcher(board, time_ms, max_nodes).search(Colour(colour_value), max_depth, moves)
+
+
+def best_of(results: list, key) -> SearchResult:
+    results = [result for result in results if result.move is not None]
+    if not results:
+        return SearchResult(None, 0, 0, 0, 0.0, 0.0)
+    best = max(results, key=key)
+    nodes = sum(result.nodes for result in results)
+    seconds = max(result.seconds for result in results)
+    return SearchResult(best.move, best.score, best.depth, nodes, seconds, nodes / seconds if seconds else 0.0)
+
+
+def share_task(position: tuple, colour_value: int, moves: list, time_ms, max_nodes, max_depth) -> tuple:
+    # the search result plus (score, move) for every depth it finished, so shares can be compared at one depth
+    board = unpack(position)
+    searcher = Searcher(board, time_ms, max_nodes)
+    result = searcher.search(Colour(colour_value), max_depth, moves)
+    return result, [(score, unpack_move(move)) for score, move in searcher.iterations]
+
+
+def split_search(board: Board, colour: Colour, time_ms=None, max_nodes=None, max_depth=MAX_PLY,
+                 processes=None) -> SearchResult:
+    # every worker searches its own share of the root moves to the same limits. With a time or node budget the
+    # shares can finish different depths, so the answer comes from the deepest depth every share finished; at
+    # one depth the best of the shares' scores is the score of a search of all the moves.
+    processes = processes or multiprocessing.cpu_count()
+    moves = list(board.packed_legal_moves(colour))
+    shares = [moves[index::processes] for index in range(processes) if moves[index::processes]]
+    position = pack(board)
+    with multiprocessing.Pool(len(shares) or 1) as pool:
+        finished = pool.starmap(share_task, [(position, colour.value, share, time_ms, max_nodes, max_depth)
+                                             for share in shares], 1)
+    results = [result for result, iterations in finished]
+    # a share that didn't finish a single depth has nothing to compare, so it is left out. A share that stopped
+    # early on a forced mate has an exact score and doesn't hold the others back to its depth.
+    finished = [iterations for result, iterations in finished if iterations]
+    if not finished:
+        return best_of(results, lambda result: result.score)
+    open_ended = [len(iterations) for iterations in finished if abs(iterations[-1][0]) < MATE_SCORE - MAX_PLY]
+    depth = min(open_ended) if open_ended else max(len(iterations) for iterations in finished)
+    score, move = max((iterations[min(depth, len(iterations)) - 1] for iterations in finished),
+                      key=lambda entry: entry[0])
+    nodes = sum(result.nodes for result in results)
+    seconds = max(result.seconds for result in results)
+    return SearchResult(move, score, depth, nodes, seconds, nodes / seconds if seconds else 0.0)
+
+
+def lazy_smp_search(board: Board, colour: Colour, time_ms=None, max_nodes=None, max_depth=MAX_PLY,
+                    processes=None) -> SearchResult:
+    # every worker searches the whole root, each with its own move order, and the deepest answer is kept
+    processes = processes or multiprocessing.cpu_count()
+    moves = list(board.packed_legal_moves(colour))
+    position = pack(board)
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(search_task, [(position, colour.value, list(moves), time_ms, max_nodes, max_depth,
+                                              index) for index in range(processes)], 1)
+    # the deepest finished search wins, then the best score; a shallower score isn't comparable to a deeper one
+    return best_of(results, lambda result: (result.depth, result.score))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count perft nodes or search a position on every core.")
+    parser.add_argument("--position", choices=sorted(POSITIONS), default="kiwipete")
+    parser.add_argument("--fen", help="position to use instead of one of the perft positions")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--processes", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--search", choices=["split", "smp"], help="search for a move instead of counting nodes")
+    parser.add_argument("--time", type=int, help="search time in milliseconds")
+    args = parser.parse_args()
+
+    board = Board.from_fen(args.fen or POSITIONS[args.position][0])
+    start = time.perf_counter()
+    if args.search:
+        run = split_search if args.search == "split" else lazy_smp_search
+        result = run(board, board.turn, args.time, None, args.depth, args.processes)
+        print("%s score %d depth %d, %d nodes" % (result.move, result.score, result.depth, result.nodes))
+    else:
+        nodes = parallel_perft(board, args.depth, args.processes)
+        print("%d nodes" % nodes)
+    elapsed = time.perf_counter() - start
+    print("%.3fs" % elapsed)
@@ -0,0 +1,66 @@
+import parallel
+from board_and_pieces import Board, Colour
+from perft import POSITIONS, divide, perft
+from search import search
+
+
+def test_pack():
+    board = Board.from_fen(POSITIONS["position5"][0])
+    board.push((3, 1), (2, 0, "Q"))
+    board.push((5, 0), (4, 0))
+    copy = parallel.unpack(parallel.pack(board))
+    assert copy.key == board.key
+    assert copy.halfmove_clock == board.halfmove_clock == 1
+    assert copy.fullmove_number == board.fullmove_number == 9
+    assert copy.repetitions == board.repetitions
+    assert copy.legal_moves(copy.turn) == board.legal_moves(board.turn)
+
+
+def test_split():
+    board = Board.from_fen(POSITIONS["position4"][0])
+    # six root moves aren't enough for 20 tasks, so it goes a ply deeper
+    work = parallel.split(board, 3, 20)
+    assert len(work) == 264
+    assert {move for move, data, left in work} == set(board.legal_moves(board.turn))
+    assert all(left == 1 for move, data, left in work)
+    assert sum(perft(Board.from_bytes(data), left) for move, data, left in work) == 9467
+
+
+def test_parallel_perft():
+    for name in ["start", "kiwipete", "position3", "position4", "position5"]:
+        fen, expected = POSITIONS[name]
+        board = Board.from_fen(fen)
+        for depth in range(1, 4):
+            assert parallel.parallel_perft(board, depth, 2) == expected[depth - 1]
+    board = Board.from_fen(POSITIONS["kiwipete"][0])
+    assert parallel.divide(board, 3, 2) == divide(board, 3)
+
+
+def test_split_search():
+    board = Board.from_fen(POSITIONS["kiwipete"][0])
+    serial = search(board, Colour.WHITE, max_depth=2)
+    result = parallel.split_search(board, Colour.WHITE, max_depth=2, processes=3)
+    assert result.depth == 2
+    assert result.score == serial.score
+    # back rank mate
+    board = Board.from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    assert parallel.split_search(board, Colour.WHITE, max_depth=2, processes=2).move == ((0, 7), (0, 0))
+
+
+def test_split_search_on_time():
+    # the shares finish different depths in the time; the answer is the one a search to their common depth gives
+    board = Board.from_fen(POSITIONS["kiwipete"][0])
+    result = parallel.split_search(board, Colour.WHITE, time_ms=400, processes=3)
+    assert result.depth >= 1
+    assert result.move in board.legal_moves(Colour.WHITE)
+    assert result.score == search(board, Colour.WHITE, max_depth=result.depth).score
+
+
+def test_lazy_smp_search():
+    board = Board.from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    result = parallel.lazy_smp_search(board, Colour.WHITE, max_depth=3, processes=2)
+    assert result.move == ((0, 7), (0, 0))
+    board = Board.from_fen(POSITIONS["position3"][0])
+    result = parallel.lazy_smp_search(board, Colour.WHITE, time_ms=300, processes=2)
+    assert result.move in board.legal_moves(Colour.WHITE)
+    assert result.depth >= 1
@@ -0,0 +1,85 @@
+import argparse
+import time
+
+from board_and_pieces import Board
+
+# standard perft positions with their known node counts for depths 1 to 5
+POSITIONS = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+              [20, 400, 8902, 197281, 4865609]),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                 [48, 2039, 97862, 4085603, 193690690]),
+    "position3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  [14, 191, 2812, 43238, 674624]),
+    "position4": ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  [6, 264, 9467, 422333, 15833292]),
+    "position5": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  [44, 1486, 62379, 2103487, 89941194]),
+    "position6": ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                  [46, 2079, 89890, 3894594, 164075551]),
+}
+
+
+def perft(board: Board, depth: int) -> int:
+    if depth == 0:
+        return 1
+    moves = board.packed_legal_moves(board.turn)
+    # the last ply doesn't need to be played out to be counted
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.push_move(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def divide(board: Board, depth: int) -> dict:
+    # node counts below each root move, for finding which move a wrong total comes from
+    counts = {}
+    for piece_location, move_location in board.legal_moves(board.turn):
+        board.push(piece_location, move_location)
+        counts[(piece_location, move_location)] = perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
+def benchmark(names, max_depth: int) -> bool:
+    all_correct = True
+    for name in names:
+        fen, expected = POSITIONS[name]
+        for depth in range(1, max_depth + 1):
+            board = Board.from_fen(fen)
+            start = time.perf_counter()
+            nodes = perft(board, depth)
+            elapsed = time.perf_counter() - start
+            correct = nodes == expected[depth - 1]
+            all_correct = all_correct and correct
+            print("%-10s depth %d: %10d nodes %8.3fs %10.0f nodes/s  %s" % (
+                name, depth, nodes, elapsed, nodes / elapsed if elapsed else 0,
+                "ok" if correct else "MISMATCH (expected %d)" % expected[depth - 1]))
+    return all_correct
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Count move generation nodes and time them.")
+    parser.add_argument("--depth", type=int, default=3,
+                        help="deepest depth to run, 1 to 5")
+    parser.add_argument("--position", choices=sorted(POSITIONS), action="append",
+                        help="standard position to run (default: all of them)")
+    parser.add_argument("--fen", help="divide this position instead of running the benchmark")
+    parser.add_argument("--divide", action="store_true",
+                        help="print the node count below each root move")
+    args = parser.parse_args()
+
+    if args.divide or args.fen:
+        board = Board.from_fen(args.fen or POSITIONS[(args.position or ["start"])[0]][0])
+        counts = divide(board, args.depth)
+        for move, count in counts.items():
+            print(move, count)
+        print("total", sum(counts.values()))
+    else:
+        if not benchmark(args.position or list(POSITIONS), args.depth):
+            raise SystemExit(1)
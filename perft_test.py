@@ -0,0 +1,24 @@
+from board_and_pieces import Board
+from perft import POSITIONS, divide, perft
+
+
+def test_perft_start():
+    board = Board()
+    assert perft(board, 1) == 20
+    assert perft(board, 2) == 400
+    assert perft(board, 3) == 8902
+    # perft leaves the board as it found it
+    assert len(board.move_stack) == 0
+    assert perft(board, 2) == 400
+
+
+def test_perft_positions():
+    for name, depth in [("kiwipete", 2), ("position3", 3), ("position4", 2), ("position5", 2), ("position6", 2)]:
+        fen, expected = POSITIONS[name]
+        assert perft(Board.from_fen(fen), depth) == expected[depth - 1]
+
+
+def test_divide():
+    counts = divide(Board.from_fen(POSITIONS["position3"][0]), 2)
+    assert len(counts) == 14
+    assert sum(counts.values()) == 191
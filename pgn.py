@@ -0,0 +1,198 @@
+import argparse
+import re
+import sys
+import time
+from typing import NamedTuple
+
+from board_and_pieces import Board, Colour
+
+# read this much of the file at a time
+CHUNK_SIZE = 1 << 20
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+SAN_PIECES = {"N": 1, "B": 2, "R": 3, "Q": 4, "K": 5}
+SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h])([1-8])(?:=?([NBRQ]))?$")
+HEADER = re.compile(r'^\[(\w+)\s+"(.*)"\]$')
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+
+
+class PGNGame(NamedTuple):
+    headers: dict
+    # SAN moves of the main line, without move numbers, comments or variations
+    moves: list
+    result: str
+
+
+def _lines(file, chunk_size: int):
+    # the file's lines, read a chunk at a time rather than all at once
+    rest = ""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+def _tokens(text: str):
+    # movetext tokens with comments, variations and annotations taken out
+    depth = 0
+    for token in re.findall(r"\{[^}]*\}?|;[^\n]*|\(|\)|[^\s(){};]+", text):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token[0] not in "{;$":
+            token = MOVE_NUMBER.sub("", token)
+            # "exd6 e.p." marks en passant, which the move itself already says
+            if token.endswith("e.p."):
+                token = token[:-4]
+            if token:
+                yield token
+
+
+def read_games(file, chunk_size=CHUNK_SIZE):
+    # yields a PGNGame for every game in file, one game in memory at a time
+    headers = {}
+    movetext = []
+    for line in _lines(file, chunk_size):
+        line = line.strip()
+        if line.startswith("%"):
+            continue
+        match = HEADER.match(line)
+        if match:
+            # a header after movetext starts the next game
+            if movetext:
+                yield _game(headers, movetext)
+                headers, movetext = {}, []
+            headers[match.group(1)] = match.group(2)
+        elif line:
+            movetext.append(line)
+    if headers or movetext:
+        yield _game(headers, movetext)
+
+
+def _game(headers: dict, movetext: list) -> PGNGame:
+    moves = []
+    result = headers.get("Result", "*")
+    for token in _tokens("\n".join(movetext)):
+        if token in RESULTS:
+            result = token
+        else:
+            moves.append(token)
+    return PGNGame(headers, moves, result)
+
+
+def square(name: str) -> tuple:
+    # "e4" -> (4, 4), with rank 8 at the top of the board
+    return ord(name[0]) - ord("a"), 8 - int(name[1])
+
+
+def parse_san(board: Board, san: str, colour: Colour) -> tuple:
+    # the legal (piece_location, move_location) move that san stands for
+    san = san.rstrip("+#!?")
+    legal = board.cached_legal_moves(colour)
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        side = "Kingside" if len(san) == 3 else "Queenside"
+        for piece_location, move_location in legal:
+            if move_location == (side,):
+                return piece_location, move_location
+        raise ValueError("illegal move %s" % san)
+    match = SAN.match(san)
+    if match is None:
+        raise ValueError("can't read move %s" % san)
+    letter, from_file, from_rank, to_file, to_rank, promote_to = match.groups()
+    kind = SAN_PIECES[letter] if letter else 0
+    to_square = square(to_file + to_rank)
+    if kind == 0 and (to_square[1] == 0 or to_square[1] == 7):
+        to_square += (promote_to or "Q",)
+    candidates = []
+    for piece_location, move_location in legal:
+        # en passant moves have the captured pawn's direction after the square
+        if (move_location if len(to_square) == 3 else move_location[:2]) != to_square \
+                or board.squares[piece_location[0] + 8 * piece_location[1]].kind != kind:
+            continue
+        if from_file and piece_location[0] != ord(from_file) - ord("a"):
+            continue
+        if from_rank and piece_location[1] != 8 - int(from_rank):
+            continue
+        candidates.append((piece_location, move_location))
+    if len(candidates) != 1:
+        raise ValueError("%s move %s" % ("ambiguous" if candidates else "illegal", san))
+    return candidates[0]
+
+
+def start_board(game: PGNGame) -> Board:
+    if "FEN" in game.headers:
+        return Board.from_fen(game.headers["FEN"])
+    return Board()
+
+
+def replay(game: PGNGame):
+    # yields (ply, san, board) after every move of game. The board is the same object throughout, so deepcopy it
+    # to keep a position past the next ply.
+    board = start_board(game)
+    colour = board.turn
+    for ply, san in enumerate(game.moves, 1):
+        try:
+            board.make_move(*parse_san(board, san, colour))
+        except ValueError as error:
+            raise ValueError("%s at ply %d of %s" % (error, ply, describe(game))) from error
+        colour = board.turn
+        yield ply, san, board
+
+
+def describe(game: PGNGame) -> str:
+    return "%s - %s (%s)" % (game.headers.get("White", "?"), game.headers.get("Black", "?"),
+                             game.headers.get("Date", "?"))
+
+
+def report(game: PGNGame, error: ValueError) -> None:
+    print("skipped: %s" % error, file=sys.stderr)
+
+
+def final_positions(file, chunk_size=CHUNK_SIZE, on_error=report):
+    # yields (game, board) with each game played to its last move. A game with a move that can't be played is
+    # left out and passed to on_error(game, error), and the games after it are still read.
+    for game in read_games(file, chunk_size):
+        board = None
+        try:
+            for ply, san, board in replay(game):
+                pass
+            if board is None:
+                board = start_board(game)
+        except ValueError as error:
+            on_error(game, error)
+            continue
+        yield game, board
+
+
+def positions(file, chunk_size=CHUNK_SIZE, on_error=report):
+    # yields (game, ply, san, board) for every move of every game. A game stops at a move that can't be played,
+    # which is passed to on_error(game, error), and the next game carries on.
+    for game in read_games(file, chunk_size):
+        try:
+            for ply, san, board in replay(game):
+                yield game, ply, san, board
+        except ValueError as error:
+            on_error(game, error)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay every game in a PGN file and time it.")
+    parser.add_argument("file", help="PGN file to read")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    games, plies = 0, 0
+    skipped = []
+    with open(args.file, encoding="utf-8", errors="replace") as file:
+        for game, ply, san, board in positions(file, on_error=lambda game, error: skipped.append(error)):
+            plies += 1
+            games += ply == 1
+    elapsed = time.perf_counter() - start
+    print("%d games, %d plies in %.3fs, %.0f plies/s" % (games, plies, elapsed, plies / elapsed if elapsed else 0))
+    for error in skipped:
+        print("skipped: %s" % error)
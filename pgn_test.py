@@ -0,0 +1,93 @@
+import io
+
+import pytest
+
+from board_and_pieces import Colour, GameStatus
+from pgn import final_positions, parse_san, positions, read_games, replay
+
+GAMES = """[Event "Casual"]
+[White "A"]
+[Black "B"]
+[Result "0-1"]
+
+1. f3 e5 2. g4 {a blunder} (2. e4 Nc6) 2... Qh4# 0-1
+
+[Event "Casual"]
+[White "C"]
+[Black "D"]
+[Result "1-0"]
+
+1. e4 d5 2. exd5 Qxd5 3. Nc3 Qa5 4. d4 c6 5. Nf3 Bg4 6. Bf4 e6 7. h3 Bxf3 8. Qxf3 Bb4 9. Be2 Nd7 10. a3
+O-O-O $1 11. axb4 Qxa1+ 12. Kd2 Qxh1 13. Qxc6+ bxc6 14. Ba6# 1-0
+
+[Event "Promotion"]
+[SetUp "1"]
+[FEN "8/P6k/8/8/8/8/6p1/K7 w - - 0 1"]
+
+1. a8=N g1=Q+ 2. Kb2 Qd4+ 3. Ka2 *
+"""
+
+
+def test_read_games():
+    # a tiny chunk size splits lines across reads
+    games = list(read_games(io.StringIO(GAMES), chunk_size=7))
+    assert len(games) == 3
+    assert games[0].headers["White"] == "A"
+    assert games[0].moves == ["f3", "e5", "g4", "Qh4#"]
+    assert games[0].result == "0-1"
+    assert len(games[1].moves) == 27
+    assert games[1].moves[19:21] == ["O-O-O", "axb4"]
+    assert games[2].result == "*"
+
+
+def test_final_positions():
+    results = list(final_positions(io.StringIO(GAMES)))
+    game, board = results[0]
+    assert board.game_status(Colour.WHITE) == GameStatus.CHECKMATE
+    game, board = results[1]
+    assert board.game_status(Colour.BLACK) == GameStatus.CHECKMATE
+    # black castled queenside
+    assert board.squares[2].kind == 5 and board.squares[3].kind == 3
+    game, board = results[2]
+    assert board.squares[0].kind == 1 and board.squares[3 + 8 * 4].kind == 4
+
+
+def test_positions():
+    plies = [(ply, san) for game, ply, san, board in positions(io.StringIO(GAMES))]
+    assert plies[:4] == [(1, "f3"), (2, "e5"), (3, "g4"), (4, "Qh4#")]
+    assert len(plies) == 4 + 27 + 5
+
+
+def test_parse_san():
+    game, board = next(final_positions(io.StringIO("1. e4 e5 2. Nc3 Nc6 *")))
+    assert parse_san(board, "Nd5", Colour.WHITE) == ((2, 5), (3, 3))
+    assert parse_san(board, "Nge2", Colour.WHITE) == ((6, 7), (4, 6))
+    with pytest.raises(ValueError):
+        parse_san(board, "Qd5", Colour.WHITE)
+    # both knights can go to e2
+    with pytest.raises(ValueError):
+        parse_san(board, "Ne2", Colour.WHITE)
+    with pytest.raises(ValueError):
+        list(replay(next(read_games(io.StringIO("1. e4 e5 2. Ke3 *")))))
+
+
+def test_bad_games_are_skipped():
+    text = "1. e4 e5 2. Ke3 *\n\n[White \"E\"]\n\n1. e4 d5 2. e5 f5 3. exf6 e.p. Nxf6 *\n"
+    errors = []
+    plies = [(game.headers.get("White"), ply, san) for game, ply, san, board in
+             positions(io.StringIO(text), on_error=lambda game, error: errors.append(error))]
+    # the first game stops at its illegal king move, the next one is read to the end
+    assert plies[:2] == [(None, 1, "e4"), (None, 2, "e5")]
+    assert plies[2:] == [("E", 1, "e4"), ("E", 2, "d5"), ("E", 3, "e5"), ("E", 4, "f5"), ("E", 5, "exf6"),
+                         ("E", 6, "Nxf6")]
+    assert len(errors) == 1 and "Ke3 at ply 3" in str(errors[0])
+    errors = []
+    results = list(final_positions(io.StringIO(text), on_error=lambda game, error: errors.append(error)))
+    assert [game.headers["White"] for game, board in results] == ["E"]
+    assert len(errors) == 1
+    # a bad FEN header in a game without moves is reported the same way
+    errors = []
+    text += '\n[FEN "nonsense"]\n\n*\n'
+    results = list(final_positions(io.StringIO(text), on_error=lambda game, error: errors.append(error)))
+    assert [game.headers["White"] for game, board in results] == ["E"]
+    assert len(errors) == 2 and "nonsense" in str(errors[1])
@@ -6,6 +6,12 @@ from board_and_pieces import Queen
 from board_and_pieces import King
 from board_and_pieces import Board
 from board_and_pieces import Colour
+from board_and_pieces import GameStatus
+from board_and_pieces import MOVE_CAPTURE, MOVE_KINGSIDE, pack_move, unpack_move
+import sys
+import threading
+
+import board_and_pieces
 import pytest
 
 
@@ -250,3 +256,428 @@ def test_draw():
     stalemate_board = read_board("board_stalemate.txt")
     assert stalemate_board.is_draw(Colour.BLACK) == True
     assert stalemate_board.is_draw(Colour.WHITE) == False
+
+
+def assert_same_board(board, other):
+    assert set(board.board_dict) == set(other.board_dict)
+    for piece in board.board_dict:
+        assert board.board_dict[piece].x == other.board_dict[piece].x
+        assert board.board_dict[piece].y == other.board_dict[piece].y
+        assert board.board_dict[piece].colour == other.board_dict[piece].colour
+        assert board.board_dict[piece].has_moved == other.board_dict[piece].has_moved
+        assert board.board_dict[piece].letter == other.board_dict[piece].letter
+
+
+def test_push_pop():
+    # normal move and capture
+    board = read_board("board3.txt")
+    original = board.deepcopy()
+    board.push((5, 7), (1, 3))
+    board.push((2, 2), (1, 4))
+    board.push((1, 3), (3, 1))
+    board.pop()
+    board.pop()
+    board.pop()
+    assert_same_board(board, original)
+    assert board.last_moved is None
+    # en passant
+    board = read_board("board6.txt")
+    original = board.deepcopy()
+    board.push((0, 3), (1, 2, -1))
+    assert not (1, 3) in board.board_dict
+    board.pop()
+    assert_same_board(board, original)
+    # castling
+    board = read_board("board_white_castle_block.txt")
+    original = board.deepcopy()
+    board.push((4, 0), ("Queenside",))
+    board.pop()
+    assert_same_board(board, original)
+    # promotion
+    board = Board({(0, 1): Pawn(0, 1, Colour.WHITE), (1, 0): Rook(1, 0, Colour.BLACK),
+                   (4, 7): King(4, 7, Colour.WHITE), (4, 0): King(4, 0, Colour.BLACK)})
+    original = board.deepcopy()
+    board.push((0, 1), (1, 0, "N"))
+    assert board.board_dict[(1, 0)].letter == "♞"
+    board.pop()
+    assert_same_board(board, original)
+
+
+def test_pseudo_legal_moves():
+    # the bitboard generator should agree with the piece by piece generators
+    for board_file in ["board1.txt", "board3.txt", "board4.txt", "board_white_castle_block.txt"]:
+        board = read_board(board_file)
+        # read_board can't tell which pawns have moved; the bitboard generator goes by rank
+        for square, piece in board.board_dict.items():
+            if isinstance(piece, Pawn) and square[1] != (6 if piece.colour == Colour.WHITE else 1):
+                piece.has_moved = True
+        for colour in [Colour.WHITE, Colour.BLACK]:
+            expected = set()
+            for square, piece in board.board_dict.items():
+                if piece.colour == colour:
+                    for move in piece.get_valid_moves(board, board.last_moved, board.initial_pos, board.final_pos):
+                        expected.add((square, move))
+            moves = board.pseudo_legal_moves(colour)
+            assert len(moves) == len(expected)
+            assert set(moves) == expected
+    # en passant
+    board = Board(read_board("board6.txt").board_dict, "♙", (1, 1), (1, 3))
+    assert ((0, 3), (1, 2, -1)) in board.pseudo_legal_moves(Colour.WHITE)
+
+
+def test_iter_legal_moves():
+    # kiwipete, with an en passant capture, promotions and both castles between the two sides
+    for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 b kq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"]:
+        board = Board.from_fen(fen)
+        pseudo_legal = list(board.iter_pseudo_legal_moves(board.turn))
+        assert sorted(pseudo_legal, key=str) == sorted(board.pseudo_legal_moves(board.turn), key=str)
+        moves = list(board.iter_legal_moves(board.turn))
+        assert sorted(moves, key=str) == sorted(board.legal_moves(board.turn), key=str)
+        # captures and promotions come before every quiet move
+        loud = [len(move) == 3 or len(move) == 2 and board.squares[move[0] + 8 * move[1]] is not None
+                for location, move in moves]
+        assert loud == sorted(loud, reverse=True)
+    # stopping early leaves the board as it was
+    board = Board()
+    key = board.key
+    assert next(board.iter_legal_moves(Colour.WHITE)) in board.legal_moves(Colour.WHITE)
+    assert board.key == key and not board.move_stack
+
+
+def test_legal_moves_without_trying_them():
+    # en passant would uncover the rook on the king's rank
+    board = Board.from_fen("8/8/8/KPp4r/8/8/8/7k w - c6 0 1")
+    assert ((1, 3), (2, 2, -1)) not in board.legal_moves(Colour.WHITE)
+    assert ((1, 3), (1, 2)) in board.legal_moves(Colour.WHITE)
+    # but takes a pawn that is giving check
+    board = Board.from_fen("8/8/8/3k4/2Pp4/8/8/4K3 b - c3 0 1")
+    assert ((3, 4), (2, 5, 1)) in board.legal_moves(Colour.BLACK)
+    # the pinned bishop can only move along the pin, and the pinned knight can't move at all
+    board = Board.from_fen("4r2k/8/8/b7/8/8/3BN3/4K3 w - - 0 1")
+    moves = board.legal_moves(Colour.WHITE)
+    assert sorted(move for location, move in moves if location == (3, 6)) == [(0, 3), (1, 4), (2, 5)]
+    assert not [move for location, move in moves if location == (4, 6)]
+    # the king can't step back along the line of the rook checking it, and in double check only the king moves
+    board = Board.from_fen("4k3/8/8/8/8/8/8/r3K1N1 w - - 0 1")
+    assert ((4, 7), (5, 7)) not in board.legal_moves(Colour.WHITE)
+    board = Board.from_fen("4k3/8/8/8/8/3n4/8/r3K1N1 w - - 0 1")
+    assert all(location == (4, 7) for location, move in board.legal_moves(Colour.WHITE))
+    assert ((6, 7), (4, 6)) not in board.legal_moves(Colour.WHITE)
+
+
+def test_packed_moves():
+    # castling both ways, promotions with and without a capture, en passant
+    for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 b kq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"]:
+        board = Board.from_fen(fen)
+        packed = board.packed_legal_moves(board.turn)
+        assert packed.typecode == "H"
+        moves = board.legal_moves(board.turn)
+        assert [unpack_move(move) for move in packed] == moves
+        for move, (piece_location, move_location) in zip(packed, moves):
+            assert board.pack(piece_location, move_location) == move
+            victim = len(move_location) != 1 and board.squares[move_location[0] + 8 * move_location[1]]
+            en_passant = len(move_location) == 3 and move_location[2] in (-1, 1)
+            assert bool(move >> 12 & MOVE_CAPTURE) == bool(victim or en_passant)
+            key = board.key
+            board.push_move(move)
+            packed_fen = board.to_fen()
+            board.pop()
+            board.push(piece_location, move_location)
+            assert board.to_fen() == packed_fen
+            board.pop()
+            assert board.key == key
+    assert pack_move((4, 7), ("Kingside",)) == 60 | 62 << 6 | MOVE_KINGSIDE << 12
+    assert unpack_move(pack_move((1, 1), (0, 0, "N"), True)) == ((1, 1), (0, 0, "N"))
+
+
+def test_move_memos_are_bounded(monkeypatch):
+    monkeypatch.setattr(board_and_pieces, "MAX_MEMO_ENTRIES", 8)
+    for name in ["_TARGET_MOVES", "_PUSH_MOVES", "_PACKED_TARGET_MOVES", "_PACKED_PUSH_MOVES"]:
+        monkeypatch.setattr(board_and_pieces, name, {})
+    board = Board.from_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    count = 0
+    for move in board.packed_legal_moves(board.turn):
+        board.push_move(move)
+        count += len(board.packed_legal_moves(board.turn))
+        count += len(board.pseudo_legal_moves(board.turn))
+        board.pop()
+    assert count == 2039 + 2044
+    assert len(board_and_pieces._PACKED_TARGET_MOVES) <= 8
+    assert len(board_and_pieces._TARGET_MOVES) <= 8
+    # pawn moves are kept a rank of targets at a time
+    assert all(key >> 16 < 256 for key in board_and_pieces._PACKED_PUSH_MOVES)
+    assert all(key >> 12 < 256 for key in board_and_pieces._PUSH_MOVES)
+
+
+
+def test_move_memos_across_threads(monkeypatch):
+    # threads filling and emptying the memos never see a half built move list
+    monkeypatch.setattr(board_and_pieces, "MAX_MEMO_ENTRIES", 4)
+    interval = sys.getswitchinterval()
+    fens = ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 b kq - 0 1",
+            "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"]
+    expected = [list(board.packed_legal_moves(board.turn)) for board in map(Board.from_fen, fens)]
+    wrong = []
+
+    def work():
+        boards = [Board.from_fen(fen) for fen in fens]
+        for step in range(1000):
+            board = boards[step % len(boards)]
+            if list(board.packed_legal_moves(board.turn)) != expected[step % len(boards)]:
+                wrong.append(step)
+
+    threads = [threading.Thread(target=work) for thread in range(8)]
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not wrong
+
+
+def test_is_square_attacked():
+    board = read_board("board_check.txt")
+    # white queen on (2, 0) attacks along the back rank up to the black king
+    assert board.is_square_attacked((6, 0), Colour.WHITE)
+    assert board.is_square_attacked((3, 0), Colour.WHITE)
+    # the white knight on (6, 3) and pawn on (1, 4)
+    assert board.is_square_attacked((7, 1), Colour.WHITE)
+    assert board.is_square_attacked((0, 3), Colour.WHITE)
+    assert not board.is_square_attacked((1, 3), Colour.WHITE)
+    # black rook on (5, 2) and black pawns attack towards y = 7
+    assert board.is_square_attacked((5, 6), Colour.BLACK)
+    assert board.is_square_attacked((5, 2), Colour.BLACK)
+    assert not board.is_square_attacked((5, 7), Colour.BLACK)
+    assert board.king_square(Colour.WHITE) == (6, 7)
+    assert board.king_square(Colour.BLACK) == (6, 0)
+
+
+def test_castling_rights():
+    board = read_board("board_white_castle_block.txt")
+    assert board.castling_rights == 15
+    # moving the kingside rook away and back still loses the right
+    board.make_move((7, 7), (6, 7))
+    board.make_move((7, 0), (6, 0))
+    board.make_move((6, 7), (7, 7))
+    assert board.board_dict[(4, 7)].can_castle(board) == (True, False)
+    assert board.board_dict[(4, 0)].can_castle(board) == (True, False)
+    board.pop()
+    board.pop()
+    board.pop()
+    assert board.castling_rights == 15
+    # capturing a rook on its square removes the other side's right
+    board.make_move((2, 4), (5, 7))
+    board.make_move((5, 7), (6, 6))
+    board.make_move((6, 6), (7, 7))
+    assert not board.castling_rights & 1
+    assert board.board_dict[(4, 7)].can_castle(board) == (True, False)
+
+
+def test_zobrist_key():
+    board = Board()
+    start_key = board.key
+    assert start_key == board.compute_key()
+    # knights out and back again is the starting position, with the same side to move
+    for move in [((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (6, 7)), ((5, 2), (6, 0))]:
+        board.make_move(*move)
+        assert board.key == board.compute_key()
+    assert board.key == start_key
+    assert board == Board()
+    assert hash(board) == hash(Board())
+    # the same pieces with the other side to move is a different position
+    board.make_move((6, 7), (5, 5))
+    assert board.key != Board(board.deepcopy().board_dict).key
+    board.pop()
+    # en passant is only part of the key while it is possible
+    board.make_move((4, 6), (4, 4))
+    assert board.en_passant_file is None
+    board.make_move((0, 1), (0, 2))
+    board.make_move((4, 4), (4, 3))
+    board.make_move((3, 1), (3, 3))
+    assert board.en_passant_file == 3
+    assert board.key == board.compute_key()
+    board.make_move((4, 3), (3, 2, -1))
+    assert board.key == board.compute_key()
+    # castling, captures and promotion
+    board = read_board("board_white_castle_block.txt")
+    board.make_move((4, 7), ("Queenside",))
+    assert board.key == board.compute_key()
+    board.make_move((4, 0), ("Kingside",))
+    assert board.key == board.compute_key()
+    board.pop()
+    board.pop()
+    assert board.key == read_board("board_white_castle_block.txt").key
+    board = read_board("board_promotion_before.txt")
+    board.promote((0, 0), "Q")
+    assert board.key == board.compute_key()
+
+
+def test_game_status():
+    # fool's mate
+    board = Board()
+    for move in [((5, 6), (5, 5)), ((4, 1), (4, 3)), ((6, 6), (6, 4)), ((3, 0), (7, 4))]:
+        board.make_move(*move)
+    assert board.game_status(Colour.WHITE) == GameStatus.CHECKMATE
+    assert board.is_checkmate(Colour.WHITE)
+    assert not board.is_draw(Colour.WHITE)
+    assert board.game_status(Colour.BLACK) == GameStatus.ONGOING
+    # black king in the corner with no moves, but not in check
+    board = Board({(0, 0): King(0, 0, Colour.BLACK), (2, 1): Queen(2, 1, Colour.WHITE),
+                   (2, 2): King(2, 2, Colour.WHITE)})
+    assert board.game_status(Colour.BLACK) == GameStatus.STALEMATE
+    assert board.is_draw(Colour.BLACK)
+    assert board.game_status(Colour.WHITE) == GameStatus.ONGOING
+
+
+def test_board_dict_view():
+    board = Board()
+    # board_dict is rebuilt from the board's squares after every change
+    view = board.board_dict
+    assert board.board_dict is view
+    board.make_move((4, 6), (4, 4))
+    assert board.board_dict is not view
+    assert board.board_dict[(4, 4)].has_moved
+    assert not board.board_dict[(3, 6)].has_moved
+    assert (4, 6) not in board.board_dict
+    # the board stores shared piece types, so both sides' pawns are the same two objects
+    assert board.squares[8] is board.squares[15]
+    assert board.squares[48] is board.squares[36]
+    # pieces have no per-instance dict
+    assert not hasattr(Pawn(0, 0, Colour.WHITE), "__dict__")
+    # a copy shares nothing mutable with the original
+    copy_board = board.deepcopy()
+    copy_board.make_move((3, 1), (3, 3))
+    assert (3, 1) in board.board_dict
+    assert board.key != copy_board.key
+
+
+def test_evaluate():
+    board = Board()
+    # the starting position is symmetric
+    assert board.evaluate() == 0
+    assert board.phase == 24
+    board.make_move((4, 6), (4, 4))
+    assert board.evaluate() > 0
+    board.make_move((3, 1), (3, 3))
+    board.make_move((4, 4), (3, 3))
+    assert board.evaluate() > 50
+    # the incremental scores match a rescan through captures, castling, en passant and promotion, and undo
+    for name in ["board_white_castle_block.txt", "board_promotion_before.txt"]:
+        board = read_board(name)
+        start = board.compute_scores()
+        for piece_location, move_location in board.pseudo_legal_moves(Colour.WHITE):
+            board.push(piece_location, move_location)
+            assert (board.score_mg, board.score_eg, board.phase) == board.compute_scores()
+            board.pop()
+            assert (board.score_mg, board.score_eg, board.phase) == start
+    board = Board()
+    for move in [((4, 6), (4, 4)), ((0, 1), (0, 2)), ((4, 4), (4, 3)), ((3, 1), (3, 3)), ((4, 3), (3, 2, -1))]:
+        board.make_move(*move)
+    assert (board.score_mg, board.score_eg, board.phase) == board.compute_scores()
+    assert board.deepcopy().evaluate() == board.evaluate()
+    # kings belong in the corner with the queens on and in the centre without them
+    corner = Board({(6, 7): King(6, 7, Colour.WHITE), (4, 0): King(4, 0, Colour.BLACK)})
+    centre = Board({(4, 4): King(4, 4, Colour.WHITE), (4, 0): King(4, 0, Colour.BLACK)})
+    assert centre.evaluate() > corner.evaluate()
+    pieces = {square: piece for square, piece in Board().board_dict.items() if square not in [(4, 7), (6, 7)]}
+    corner = Board({**pieces, (6, 7): King(6, 7, Colour.WHITE)})
+    centre = Board({**pieces, (4, 4): King(4, 4, Colour.WHITE)})
+    assert corner.evaluate() > centre.evaluate()
+
+
+def test_fen():
+    start = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    board = Board.from_fen(start)
+    assert board == Board()
+    assert str(board) == str(Board())
+    assert board.moved == Board().moved
+    assert board.to_fen() == start
+    assert Board().to_fen() == start
+    for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1",
+                "8/8/8/8/3pP3/8/8/4K2k b - e3 0 1",
+                "r3k2r/8/8/8/8/8/8/R3K2R b Kq - 0 1"]:
+        assert Board.from_fen(fen).to_fen() == fen
+    # the en passant square is dropped when no pawn can take there
+    assert Board.from_fen("4k3/8/8/8/4P3/8/8/4K3 b - e3 0 1").to_fen() == "4k3/8/8/8/4P3/8/8/4K3 b - - 0 1"
+    # castling rights without the king and rook to back them are dropped
+    assert Board.from_fen("4k3/8/8/8/8/8/8/4K3 w KQkq - 0 1").castling_rights == 0
+    board = Board()
+    board.make_move((4, 6), (4, 4))
+    board.make_move((6, 0), (5, 2))
+    board.make_move((4, 7), (4, 6))
+    assert board.to_fen() == "rnbqkb1r/pppppppp/5n2/8/4P3/8/PPPPKPPP/RNBQ1BNR b kq - 2 2"
+    assert Board.from_fen(board.to_fen()) == board
+    for fen in ["", "8/8/8 w - - 0 1", "9/8/8/8/8/8/8/8 w - - 0 1", "rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w"]:
+        with pytest.raises(ValueError):
+            Board.from_fen(fen)
+
+
+def test_to_bytes():
+    for fen in ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 1",
+                "8/8/8/8/3pP3/8/8/4K2k b - e3 0 1",
+                "r3k2r/8/8/8/8/8/8/R3K2R b Kq - 0 1"]:
+        board = Board.from_fen(fen)
+        data = board.to_bytes()
+        assert len(data) == 33
+        copy = Board.from_bytes(data)
+        assert copy == board
+        assert copy.to_fen() == fen
+        assert copy.moved == board.moved
+        assert copy.legal_moves(copy.turn) == board.legal_moves(board.turn)
+    with pytest.raises(ValueError):
+        Board.from_bytes(bytes(32))
+
+
+def test_draws():
+    # knights out and back twice more is the starting position a third time
+    board = Board()
+    knight_moves = [((6, 7), (5, 5)), ((6, 0), (5, 2)), ((5, 5), (6, 7)), ((5, 2), (6, 0))]
+    for move in knight_moves * 2:
+        assert board.game_status(board.turn) == GameStatus.ONGOING
+        board.make_move(*move)
+    assert board.repetition_count() == 3
+    assert board.halfmove_clock == 8
+    assert board.game_status(Colour.WHITE) == GameStatus.THREEFOLD_REPETITION
+    assert board.is_draw(Colour.WHITE)
+    for move in knight_moves * 2:
+        board.make_move(*move)
+    assert board.game_status(Colour.WHITE) == GameStatus.FIVEFOLD_REPETITION
+    for move in knight_moves * 4:
+        board.pop()
+    assert board.repetitions == {board.key: 1}
+    assert board.halfmove_clock == 0
+    # a pawn move resets the clock
+    board.make_move((6, 7), (5, 5))
+    board.make_move((4, 1), (4, 3))
+    assert board.halfmove_clock == 0
+    assert board.fullmove_number == 2
+    # fifty moves, unless the last one mates
+    board = Board.from_fen("4k3/8/8/8/8/8/8/R3K3 w - - 99 80")
+    board.make_move((0, 7), (0, 6))
+    assert board.game_status(Colour.BLACK) == GameStatus.FIFTY_MOVE_RULE
+    board = Board.from_fen("4k3/R7/8/8/8/8/8/1R2K3 w - - 99 80")
+    board.make_move((1, 7), (1, 0))
+    assert board.game_status(Colour.BLACK) == GameStatus.CHECKMATE
+    # material
+    for fen, insufficient in [("4k3/8/8/8/8/8/8/4K3 w - - 0 1", True),
+                              ("4k3/8/8/8/8/8/8/2N1K3 w - - 0 1", True),
+                              ("4k3/8/8/8/8/8/8/2B1K3 w - - 0 1", True),
+                              ("2b1k3/8/8/8/8/8/8/2B1K3 w - - 0 1", False),
+                              ("3bk3/8/8/8/8/8/8/2B1K3 w - - 0 1", True),
+                              ("4k3/8/8/8/8/8/8/1NN1K3 w - - 0 1", False),
+                              ("4k3/8/8/8/8/8/8/1NB1K3 w - - 0 1", False),
+                              ("4k3/8/8/8/8/8/8/P3K3 w - - 0 1", False)]:
+        board = Board.from_fen(fen)
+        assert board.has_insufficient_material() == insufficient
+        assert (board.game_status(Colour.WHITE) == GameStatus.INSUFFICIENT_MATERIAL) == insufficient
@@ -0,0 +1,210 @@
+import time
+from typing import NamedTuple
+
+from board_and_pieces import MOVE_CAPTURE, MOVE_EN_PASSANT, MOVE_PROMOTION, Board, Colour, unpack_move
+
+MATE_SCORE = 100000
+MAX_PLY = 64
+# centipawns by piece kind for move ordering: pawn, knight, bishop, rook, queen, king
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]
+OTHER_COLOUR = {Colour.WHITE: Colour.BLACK, Colour.BLACK: Colour.WHITE}
+# how often, in nodes, the clock is looked at
+CHECK_EVERY = 1024
+# moves are searched packed; these pick out captures and queen promotions
+CAPTURE = MOVE_CAPTURE << 12
+QUEEN_PROMOTION = MOVE_PROMOTION + 3
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult(NamedTuple):
+    # move is a (piece_location, move_location) pair for Board.push, or None with no legal moves
+    move: tuple
+    score: int
+    depth: int
+    nodes: int
+    seconds: float
+    nodes_per_second: float
+
+
+def evaluate(board: Board, colour: Colour) -> int:
+    # the board's own evaluation, from colour's point of view
+    score = board.evaluate()
+    return score if colour == Colour.WHITE else -score
+
+
+class Searcher:
+    # Negamax alpha-beta with iterative deepening and a quiescence search over captures. Moves are tried in the
+    # order: best move from the previous iteration, captures (most valuable victim, least valuable attacker),
+    # promotions, killer moves, then quiet moves by history score.
+    def __init__(self, board: Board, time_ms=None, max_nodes=None) -> None:
+        self.board = board
+        self.time_ms = time_ms
+        self.max_nodes = max_nodes
+        self.deadline = None
+        self.nodes = 0
+        self.killers = [[None, None] for ply in range(MAX_PLY + 1)]
+        self.history = {}
+        self.iterations = []
+
+    def check_budget(self) -> None:
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def order(self, moves: list, ply: int, first=None) -> None:
+        squares = self.board.squares
+        killers = self.killers[ply]
+        history = self.history
+
+        def priority(move):
+            if move == first:
+                return 1 << 30
+            kind = move >> 12 & 7
+            if kind == MOVE_EN_PASSANT:
+                return (1 << 24) + PIECE_VALUES[0] * 16 - PIECE_VALUES[0] // 10
+            promotion = PIECE_VALUES[kind - MOVE_PROMOTION + 1] if kind >= MOVE_PROMOTION else 0
+            if move & CAPTURE:
+                victim = squares[move >> 6 & 63]
+                attacker = squares[move & 63]
+                return (1 << 24) + PIECE_VALUES[victim.kind] * 16 - PIECE_VALUES[attacker.kind] // 10 + promotion
+            if promotion:
+                return (1 << 23) + promotion
+            if move == killers[0] or move == killers[1]:
+                return 1 << 22
+            return history.get(move, 0)
+
+        moves.sort(key=priority, reverse=True)
+
+    def quiesce(self, alpha: int, beta: int, colour: Colour, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            self.check_budget()
+        stand_pat = evaluate(self.board, colour)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        board = self.board
+        # underpromotions are left to the main search
+        captures = [move for move in board.packed_legal_moves(colour)
+                    if move & CAPTURE and not MOVE_PROMOTION <= move >> 12 & 7 < QUEEN_PROMOTION]
+        self.order(captures, ply)
+        other = OTHER_COLOUR[colour]
+        for move in captures:
+            board.push_move(move)
+            score = -self.quiesce(-beta, -alpha, other, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def negamax(self, depth: int, alpha: int, beta: int, colour: Colour, ply: int) -> int:
+        board = self.board
+        # a position seen before, fifty moves without progress or no mating material is a draw whatever follows
+        if board.repetitions[board.key] > 1 or board.halfmove_clock >= 100 or board.has_insufficient_material():
+            return 0
+        if depth <= 0:
+            return self.quiesce(alpha, beta, colour, ply)
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            self.check_budget()
+        moves = list(board.packed_legal_moves(colour))
+        if not moves:
+            # mated sooner is worse; stalemate is a draw
+            return -MATE_SCORE + ply if board.in_check(colour) else 0
+        if ply >= MAX_PLY:
+            return evaluate(board, colour)
+        self.order(moves, ply)
+        other = OTHER_COLOUR[colour]
+        best = -MATE_SCORE - 1
+        for move in moves:
+            board.push_move(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, other, ply + 1)
+            board.pop()
+            if score > best:
+                best = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                # remember quiet moves that cut off, for sibling nodes (killers) and the rest of the search (history)
+                if not move & CAPTURE:
+                    killers = self.killers[ply]
+                    if move != killers[0]:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    self.history[move] = min(self.history.get(move, 0) + depth * depth, (1 << 22) - 1)
+                break
+        return best
+
+    def search_root(self, moves: list, depth: int, colour: Colour) -> tuple:
+        board = self.board
+        alpha = -MATE_SCORE - 1
+        best_move = moves[0]
+        other = OTHER_COLOUR[colour]
+        for move in moves:
+            board.push_move(move)
+            score = -self.negamax(depth - 1, -MATE_SCORE - 1, -alpha, other, 1)
+            board.pop()
+            if score > alpha:
+                alpha = score
+                best_move = move
+        return alpha, best_move
+
+    def search(self, colour: Colour, max_depth=MAX_PLY, moves=None) -> SearchResult:
+        # moves limits the root to some of the legal moves, packed, for splitting a search across processes
+        board = self.board
+        start = time.perf_counter()
+        if self.time_ms is not None:
+            self.deadline = start + self.time_ms / 1000
+        stack_depth = len(board.move_stack)
+        moves = list(board.packed_legal_moves(colour) if moves is None else moves)
+        best_move = None
+        best_score = 0
+        completed = 0
+        # (score, packed move) for every depth finished, shallowest first
+        self.iterations = []
+        if moves:
+            self.order(moves, 0)
+            best_move = moves[0]
+            for depth in range(1, max_depth + 1):
+                try:
+                    score, move = self.search_root(moves, depth, colour)
+                except SearchTimeout:
+                    # unwind whatever the interrupted iteration left on the board
+                    while len(board.move_stack) > stack_depth:
+                        board.pop()
+                    break
+                best_score, best_move, completed = score, move, depth
+                self.iterations.append((score, move))
+                # try the best move first next time
+                self.order(moves, 0, best_move)
+                if abs(score) >= MATE_SCORE - MAX_PLY:
+                    break
+        seconds = time.perf_counter() - start
+        if best_move is not None:
+            best_move = unpack_move(best_move)
+        return SearchResult(best_move, best_score, completed, self.nodes, seconds,
+                            self.nodes / seconds if seconds else 0.0)
+
+
+def search(board: Board, colour: Colour, time_ms=None, max_nodes=None, max_depth=MAX_PLY) -> SearchResult:
+    return Searcher(board, time_ms, max_nodes).search(colour, max_depth)
+
+
+def best_move(board: Board, colour: Colour, time_ms: int, book=None, tablebase=None) -> tuple:
+    # a move from the opening book or the endgame tables when they have one for the position, otherwise a search
+    if book is not None:
+        move = book.choose(board)
+        if move is not None and move in board.cached_legal_moves(colour):
+            return move
+    if tablebase is not None:
+        move = tablebase.best_move(board)
+        if move is not None:
+            return move
+    return search(board, colour, time_ms).move
@@ -0,0 +1,37 @@
+from board_and_pieces import Board, Colour
+from search import MATE_SCORE, evaluate, search
+
+
+def test_evaluate():
+    assert evaluate(Board(), Colour.WHITE) == 0
+    board = Board.from_fen("4k3/8/8/8/8/8/8/3QK3 w - - 0 1")
+    assert evaluate(board, Colour.WHITE) == board.evaluate() > 900
+    assert evaluate(board, Colour.BLACK) == -board.evaluate()
+
+
+def test_search_finds_mate_in_one():
+    board = Board.from_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+    result = search(board, Colour.WHITE, max_depth=3)
+    assert result.move == ((0, 7), (0, 0))
+    assert result.score == MATE_SCORE - 1
+
+
+def test_search_takes_hanging_queen():
+    board = Board.from_fen("4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1")
+    result = search(board, Colour.WHITE, max_depth=2)
+    assert result.move == ((3, 7), (3, 3))
+
+
+def test_search_budget_leaves_board_unchanged():
+    board = Board.from_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    key = board.key
+    result = search(board, Colour.WHITE, max_nodes=2000)
+    assert result.move in board.legal_moves(Colour.WHITE)
+    assert result.nodes <= 2000 + 1024
+    assert board.key == key
+    assert board.move_stack == []
+
+
+def test_search_no_legal_moves():
+    board = Board.from_fen("k7/2Q5/1K6/8/8/8/8/8 b - - 0 1")
+    assert search(board, Colour.BLACK, max_depth=2).move is None
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from board_and_pieces import Board
+
+# Line protocol: every request is one JSON object on its own line, and gets one JSON object back on its own line,
+# with "ok" true and the results, or "ok" false and an "error". Requests:
+#   {"cmd": "new", "fen": optional}                      -> game, fen, turn, status
+#   {"cmd": "moves", "game": id, "from": [x, y] optional} -> moves, as [piece_location, move_location] pairs
+#   {"cmd": "move", "game": id, "from": [x, y], "to": move_location} -> fen, turn, status
+#   {"cmd": "state", "game": id}                          -> fen, turn, status, moves played
+#   {"cmd": "close", "game": id}
+# Squares and moves are the lists JSON makes of the engine's tuples, e.g. [4, 4], [0, 0, "Q"] or ["Kingside"].
+DEFAULT_PORT = 8765
+# longest request line read before giving up on a client
+MAX_LINE = 1 << 16
+
+
+def position_status(data: bytes, halfmove_clock: int) -> str:
+    # runs in the executor, so it takes and returns plain values rather than a Board
+    board = Board.from_bytes(data)
+    board.halfmove_clock = halfmove_clock
+    return board.game_status(board.turn).name.lower()
+
+
+def position_moves(data: bytes) -> tuple:
+    board = Board.from_bytes(data)
+    return board.cached_legal_moves(board.turn)
+
+
+def move_status(data: bytes, halfmove_clock: int, piece_location: tuple, move_location: tuple) -> str:
+    # checks the move in the executor as well, and gives the status after it; the game's board is only changed
+    # once this has come back
+    board = Board.from_bytes(data)
+    board.halfmove_clock = halfmove_clock
+    if (piece_location, move_location) not in board.cached_legal_moves(board.turn):
+        raise ValueError("illegal move %r to %r" % (piece_location, move_location))
+    board.push(piece_location, move_location)
+    return board.game_status(board.turn).name.lower()
+
+
+def _square(value) -> tuple:
+    if not isinstance(value, list) or len(value) != 2 or not all(isinstance(c, int) and 0 <= c < 8 for c in value):
+        raise ValueError("bad square %r" % (value,))
+    return tuple(value)
+
+
+def _move_location(value) -> tuple:
+    if not isinstance(value, list) or not 1 <= len(value) <= 3:
+        raise ValueError("bad move %r" % (value,))
+    return tuple(value)
+
+
+class HostedGame:
+    def __init__(self, board: Board) -> None:
+        self.board = board
+        self.status = "ongoing"
+        self.moves = 0
+        # one request at a time changes a game, while other games carry on
+        self.lock = asyncio.Lock()
+
+    def state(self) -> dict:
+        return {"fen": self.board.to_fen(), "turn": self.board.turn.name.lower(), "status": self.status}
+
+
+class GameServer:
+    def __init__(self, executor=None, max_games=100000) -> None:
+        # executor runs everything that generates legal moves: position_status, position_moves and move_status.
+        # None is the event loop's default thread pool, where that work still holds the GIL against the loop, so
+        # a server under load wants a ProcessPoolExecutor (as serve() gives it).
+        self.executor = executor
+        self.max_games = max_games
+        self.games = {}
+        self.ids = itertools.count(1)
+
+    async def status(self, board: Board) -> str:
+        # repetitions need the game's history, which only this board has; they are cheap to check here
+        status = board.draw_status()
+        if status is not None:
+            return status.name.lower()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, position_status, board.to_bytes(),
+                                                                board.halfmove_clock)
+
+    def game(self, request: dict) -> HostedGame:
+        game = self.games.get(request.get("game"))
+        if game is None:
+            raise ValueError("no game %r" % (request.get("game"),))
+        return game
+
+    async def new(self, request: dict) -> dict:
+        if len(self.games) >= self.max_games:
+            raise ValueError("too many games")
+        fen = request.get("fen")
+        if fen is not None and not isinstance(fen, str):
+            raise ValueError("bad FEN %r" % (fen,))
+        game = HostedGame(Board.from_fen(fen) if fen else Board())
+        game.status = await self.status(game.board)
+        game_id = next(self.ids)
+        self.games[game_id] = game
+        return {"game": game_id, **game.state()}
+
+    async def moves(self, request: dict) -> dict:
+        game = self.game(request)
+        async with game.lock:
+            moves = await asyncio.get_running_loop().run_in_executor(self.executor, position_moves,
+                                                                     game.board.to_bytes())
+        if "from" in request:
+            piece_location = _square(request["from"])
+            moves = [move for move in moves if move[0] == piece_location]
+        return {"moves": moves}
+
+    async def move(self, request: dict) -> dict:
+        game = self.game(request)
+        piece_location, move_location = _square(request["from"]), _move_location(request["to"])
+        async with game.lock:
+            if game.status != "ongoing":
+                raise ValueError("game is over")
+            board = game.board
+            status = await asyncio.get_running_loop().run_in_executor(
+                self.executor, move_status, board.to_bytes(), board.halfmove_clock, piece_location, move_location)
+            board.make_move(piece_location, move_location)
+            # repetitions need the game's history, which only this board has
+            draw = board.draw_status()
+            game.moves += 1
+            game.status = status if draw is None else draw.name.lower()
+            return game.state()
+
+    async def state(self, request: dict) -> dict:
+        game = self.game(request)
+        return {**game.state(), "moves": game.moves}
+
+    async def close(self, request: dict) -> dict:
+        self.game(request)
+        del self.games[request["game"]]
+        return {}
+
+    async def dispatch(self, request: dict) -> dict:
+        handler = {"new": self.new, "moves": self.moves, "move": self.move, "state": self.state,
+                   "close": self.close}.get(request.get("cmd"))
+        if handler is None:
+            raise ValueError("unknown command %r" % (request.get("cmd"),))
+        return await handler(request)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # a line past MAX_LINE, or the client went away
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                    response = {"ok": True, **await self.dispatch(request)}
+                except (ValueError, KeyError, TypeError, IndexError) as error:
+                    response = {"ok": False, "error": str(error)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_LINE)
+
+
+async def serve(host: str, port: int, workers: int) -> None:
+    with ProcessPoolExecutor(workers) as executor:
+        server = await GameServer(executor).start(host, port)
+        print("serving on %s:%d" % server.sockets[0].getsockname()[:2])
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host games over a JSON line protocol.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, help="processes working out game status (default: one per core)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.workers))
@@ -0,0 +1,99 @@
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import server
+from server import GameServer
+
+
+async def request(reader, writer, **fields):
+    writer.write(json.dumps(fields).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def fools_mate(port: int) -> list:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    game = (await request(reader, writer, cmd="new"))["game"]
+    responses = []
+    for piece_location, move_location in [((5, 6), (5, 5)), ((4, 1), (4, 3)), ((6, 6), (6, 4)), ((3, 0), (7, 4))]:
+        responses.append(await request(reader, writer, cmd="move", game=game,
+                                       **{"from": piece_location, "to": move_location}))
+    writer.close()
+    return responses
+
+
+def run(test, executor=None):
+    async def main():
+        server = GameServer(executor)
+        async with await server.start(port=0) as listener:
+            return await test(server, listener.sockets[0].getsockname()[1])
+    return asyncio.run(main())
+
+
+def test_protocol():
+    async def test(server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        response = await request(reader, writer, cmd="new")
+        assert response["ok"] and response["status"] == "ongoing" and response["turn"] == "white"
+        game = response["game"]
+        response = await request(reader, writer, cmd="moves", game=game, **{"from": [6, 7]})
+        assert response["moves"] == [[[6, 7], [5, 5]], [[6, 7], [7, 5]]]
+        # black can't move first, and a knight can't move like a queen
+        assert not (await request(reader, writer, cmd="move", game=game, **{"from": [6, 0], "to": [5, 2]}))["ok"]
+        assert not (await request(reader, writer, cmd="move", game=game, **{"from": [6, 7], "to": [6, 5]}))["ok"]
+        assert not (await request(reader, writer, cmd="move", game=game, **{"from": [9, 9], "to": [6, 5]}))["ok"]
+        response = await request(reader, writer, cmd="move", game=game, **{"from": [6, 7], "to": [5, 5]})
+        assert response["ok"] and response["turn"] == "black"
+        assert (await request(reader, writer, cmd="state", game=game))["moves"] == 1
+        # promotion and an unknown game
+        response = await request(reader, writer, cmd="new", fen="4k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+        response = await request(reader, writer, cmd="move", game=response["game"],
+                                 **{"from": [0, 1], "to": [0, 0, "R"]})
+        assert response["fen"] == "R3k3/8/8/8/8/8/8/4K3 b - - 0 1"
+        assert not (await request(reader, writer, cmd="state", game=12345))["ok"]
+        # a FEN that isn't a string, or isn't a position, gets an error back and the connection stays open
+        assert not (await request(reader, writer, cmd="new", fen=5))["ok"]
+        assert not (await request(reader, writer, cmd="new", fen="garbage"))["ok"]
+        assert not (await request(reader, writer, cmd="fly"))["ok"]
+        writer.write(b"not json\n")
+        assert not json.loads(await reader.readline())["ok"]
+        assert (await request(reader, writer, cmd="close", game=game))["ok"]
+        assert game not in server.games
+        writer.close()
+    run(test)
+
+
+def test_concurrent_games():
+    async def test(server, port):
+        results = await asyncio.gather(*[fools_mate(port) for client in range(50)])
+        for responses in results:
+            assert all(response["ok"] for response in responses)
+            assert [response["status"] for response in responses] == ["ongoing"] * 3 + ["checkmate"]
+        assert len(server.games) == 50
+    run(test)
+
+
+def test_process_executor():
+    with ProcessPoolExecutor(2) as executor:
+        responses = run(lambda server, port: fools_mate(port), executor)
+    assert responses[-1]["status"] == "checkmate"
+
+
+def test_failed_move_is_not_played(monkeypatch):
+    def broken_status(data, halfmove_clock, piece_location, move_location):
+        raise KeyError("lost cache entry")
+
+    async def test(game_server, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        game = (await request(reader, writer, cmd="new"))["game"]
+        monkeypatch.setattr(server, "move_status", broken_status)
+        assert not (await request(reader, writer, cmd="move", game=game, **{"from": [4, 6], "to": [4, 4]}))["ok"]
+        monkeypatch.undo()
+        # the move that failed never went on the board, so it can be played again
+        state = await request(reader, writer, cmd="state", game=game)
+        assert state["moves"] == 0 and state["turn"] == "white"
+        assert len(game_server.games[game].board.move_stack) == 0
+        assert (await request(reader, writer, cmd="move", game=game, **{"from": [4, 6], "to": [4, 4]}))["ok"]
+        writer.close()
+    run(test)
@@ -0,0 +1,231 @@
+import argparse
+import mmap
+import time
+from array import array
+
+from board_and_pieces import KING_ATTACKS, PAWN_ATTACKS, Board, Colour, bishop_attacks, rook_attacks, unpack_move
+
+# Endgame tables for king and queen, king and rook, and king and pawn against a lone king, worked out by
+# retrograde analysis. Every table has a byte for each (side to move, strong king, weak king, piece) with the
+# strong side as white: 0 for a draw (or a position that can't happen) and otherwise 1 + the number of plies until
+# the strong side mates. Tables are stored one after the other behind a header and probed through mmap, so every
+# process reading the same file shares one copy of it in the page cache.
+MAGIC = b"CHESSTB1"
+TABLES = ["KQK", "KRK", "KPK"]
+# PieceType.kind of the strong side's piece in each table
+TABLE_KINDS = {"KQK": 4, "KRK": 3, "KPK": 0}
+TABLE_SIZE = 2 * 64 * 64 * 64
+# side to move in the index: the strong side, or the weak side
+STRONG = 0
+WEAK = 1
+
+
+def index(to_move: int, strong_king: int, weak_king: int, piece: int) -> int:
+    return to_move << 18 | strong_king << 12 | weak_king << 6 | piece
+
+
+def _piece_attacks(kind: int, piece: int, occupied: int) -> int:
+    if kind == 4:
+        return bishop_attacks(piece, occupied) | rook_attacks(piece, occupied)
+    if kind == 3:
+        return rook_attacks(piece, occupied)
+    # white pawns take towards y = 0
+    return PAWN_ATTACKS[1][piece]
+
+
+def _legal(kind: int, to_move: int, strong_king: int, weak_king: int, piece: int) -> bool:
+    if strong_king == weak_king or piece == strong_king or piece == weak_king:
+        return False
+    if KING_ATTACKS[strong_king] >> weak_king & 1:
+        return False
+    if kind == 0 and (piece < 8 or piece >= 56):
+        return False
+    # the weak king can't be in check with the strong side to move
+    occupied = 1 << strong_king | 1 << weak_king | 1 << piece
+    return to_move == WEAK or not _piece_attacks(kind, piece, occupied) >> weak_king & 1
+
+
+def _weak_moves(kind: int, strong_king: int, weak_king: int, piece: int) -> tuple:
+    # (squares the weak king can move to without taking the piece, whether it can take it), and whether it is in
+    # check; sliders look through the weak king so it can't step back along their line
+    occupied = 1 << strong_king | 1 << piece
+    attacked = KING_ATTACKS[strong_king] | _piece_attacks(kind, piece, occupied)
+    targets = KING_ATTACKS[weak_king] & ~attacked
+    capture = bool(targets >> piece & 1)
+    in_check = bool(_piece_attacks(kind, piece, occupied | 1 << weak_king) >> weak_king & 1)
+    return targets & ~(1 << piece), capture, in_check
+
+
+def _strong_unmoves(kind: int, strong_king: int, weak_king: int, piece: int, values: bytearray):
+    # the positions with the strong side to move that lead here by one of its moves (not a promotion), leaving out
+    # those already settled in values
+    occupied = 1 << strong_king | 1 << weak_king | 1 << piece
+    empty = ~occupied
+    sources = KING_ATTACKS[strong_king] & empty & ~KING_ATTACKS[weak_king]
+    while sources:
+        low = sources & -sources
+        parent = index(STRONG, low.bit_length() - 1, weak_king, piece)
+        if not values[parent] and _legal(kind, STRONG, low.bit_length() - 1, weak_king, piece):
+            yield parent
+        sources ^= low
+    if kind == 0:
+        # one square back towards y = 7, or two from the starting rank
+        sources = 0
+        if piece + 8 < 56 and empty >> (piece + 8) & 1:
+            sources = 1 << (piece + 8)
+            if 32 <= piece < 40 and empty >> (piece + 16) & 1:
+                sources |= 1 << (piece + 16)
+    else:
+        sources = _piece_attacks(kind, piece, occupied) & empty
+    while sources:
+        low = sources & -sources
+        parent = index(STRONG, strong_king, weak_king, low.bit_length() - 1)
+        if not values[parent] and _legal(kind, STRONG, strong_king, weak_king, low.bit_length() - 1):
+            yield parent
+        sources ^= low
+
+
+def _weak_unmoves(kind: int, strong_king: int, weak_king: int, piece: int):
+    # the positions with the weak side to move that lead here by a king move
+    occupied = 1 << strong_king | 1 << weak_king | 1 << piece
+    sources = KING_ATTACKS[weak_king] & ~occupied & ~KING_ATTACKS[strong_king]
+    while sources:
+        low = sources & -sources
+        square = low.bit_length() - 1
+        if _legal(kind, WEAK, strong_king, square, piece):
+            yield index(WEAK, strong_king, square, piece)
+        sources ^= low
+
+
+def generate(kind: int, promotions=()) -> bytearray:
+    # the table for the strong side's piece kind. Positions are settled in order of plies to mate: mated
+    # positions first, then the strong side's moves into them, then weak side positions whose moves all lead to
+    # settled ones, and so on. promotions are the tables a pawn can promote into.
+    values = bytearray(TABLE_SIZE)
+    # moves left that haven't been shown to lose, for each weak side position
+    unresolved = array("B", bytes(TABLE_SIZE // 2))
+    buckets = [[] for plies in range(256)]
+    for strong_king in range(64):
+        for weak_king in range(64):
+            for piece in range(64):
+                if not _legal(kind, WEAK, strong_king, weak_king, piece):
+                    continue
+                targets, capture, in_check = _weak_moves(kind, strong_king, weak_king, piece)
+                moves = bin(targets).count("1") + capture
+                if moves:
+                    unresolved[index(0, strong_king, weak_king, piece)] = moves
+                elif in_check:
+                    buckets[0].append(index(WEAK, strong_king, weak_king, piece))
+                if promotions and piece < 16:
+                    _seed_promotions(promotions, strong_king, weak_king, piece, buckets)
+    for plies, bucket in enumerate(buckets):
+        for position in bucket:
+            if values[position]:
+                continue
+            values[position] = plies + 1
+            to_move = position >> 18
+            strong_king = position >> 12 & 63
+            weak_king = position >> 6 & 63
+            piece = position & 63
+            if to_move == WEAK:
+                buckets[plies + 1].extend(_strong_unmoves(kind, strong_king, weak_king, piece, values))
+            else:
+                for parent in _weak_unmoves(kind, strong_king, weak_king, piece):
+                    left = unresolved[parent & 0x3FFFF] - 1
+                    unresolved[parent & 0x3FFFF] = left
+                    if not left:
+                        buckets[plies + 1].append(parent)
+    return values
+
+
+def _seed_promotions(promotions, strong_king: int, weak_king: int, piece: int, buckets: list) -> None:
+    # a pawn one step from promoting wins as fast as the best piece it can become, with the strong side to move
+    target = piece - 8
+    if target in (strong_king, weak_king) or not _legal(0, STRONG, strong_king, weak_king, piece):
+        return
+    for table in promotions:
+        value = table[index(WEAK, strong_king, weak_king, target)]
+        if value:
+            buckets[value].append(index(STRONG, strong_king, weak_king, piece))
+
+
+def build(path: str) -> None:
+    # works out every table and writes them to path
+    tables = {"KQK": generate(4), "KRK": generate(3)}
+    # promoting to a bishop or knight can only draw
+    tables["KPK"] = generate(0, [tables["KQK"], tables["KRK"]])
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        for name in TABLES:
+            file.write(tables[name])
+
+
+class Tablebase:
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC or len(self.data) != len(MAGIC) + len(TABLES) * TABLE_SIZE:
+            self.data.close()
+            raise ValueError("%s is not an endgame table file" % path)
+
+    def close(self) -> None:
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def probe(self, board: Board):
+        # (result, plies) for the side to move with best play: result is 1 for a win, 0 for a draw and -1 for a
+        # loss, and plies counts the moves until mate. None if the position isn't covered by the tables.
+        bitboards = board.bitboards
+        if bin(board.occupancy[0]).count("1") != 3 or board.castling_rights or \
+                not bitboards[5] or not bitboards[11]:
+            return None
+        for table, name in enumerate(TABLES):
+            kind = TABLE_KINDS[name]
+            for strong, offset in ((Colour.WHITE, 0), (Colour.BLACK, 6)):
+                piece = bitboards[offset + kind]
+                if piece:
+                    break
+            else:
+                continue
+            # the tables have the strong side as white; a black strong side is the same position upside down
+            flip = 56 if strong == Colour.BLACK else 0
+            strong_king = (bitboards[offset + 5].bit_length() - 1) ^ flip
+            weak_king = (bitboards[6 - offset + 5].bit_length() - 1) ^ flip
+            to_move = STRONG if board.turn == strong else WEAK
+            position = index(to_move, strong_king, weak_king, (piece.bit_length() - 1) ^ flip)
+            value = self.data[len(MAGIC) + table * TABLE_SIZE + position]
+            if not value:
+                return 0, 0
+            return (1 if to_move == STRONG else -1), value - 1
+        return None
+
+    def best_move(self, board: Board):
+        # the move that mates soonest, holds out longest or keeps the draw, or None for a position not covered
+        if self.probe(board) is None:
+            return None
+        best, best_score = None, None
+        for move in board.packed_legal_moves(board.turn):
+            board.push_move(move)
+            # a capture or an underpromotion to a bishop or knight leaves the tables: it's a draw
+            result, plies = self.probe(board) or (0, 0)
+            board.pop()
+            # the opponent's result after the move; mating sooner and being mated later are better
+            score = -result * 1000 + (plies if result > 0 else -plies)
+            if best_score is None or score > best_score:
+                best, best_score = move, score
+        return None if best is None else unpack_move(best)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work out the KQK, KRK and KPK endgame tables.")
+    parser.add_argument("output", help="file to write the tables to")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build(args.output)
+    print("built in %.1fs" % (time.perf_counter() - start))
@@ -0,0 +1,55 @@
+import pytest
+
+import tablebase
+from board_and_pieces import Board, Colour, GameStatus
+from search import best_move
+from tablebase import Tablebase
+
+
+@pytest.fixture(scope="module")
+def tables(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tables") / "tables.bin")
+    tablebase.build(path)
+    with Tablebase(path) as tables:
+        yield tables
+
+
+def test_longest_mates(tables):
+    # mate in 10 with a queen and in 16 with a rook, at the most, with the strong side to move
+    strong_to_move = tablebase.TABLE_SIZE // 2
+    for table, moves in [(0, 10), (1, 16)]:
+        start = len(tablebase.MAGIC) + table * tablebase.TABLE_SIZE
+        assert max(tables.data[start:start + strong_to_move]) - 1 == 2 * moves - 1
+
+
+def test_probe(tables):
+    board = Board.from_fen("k7/8/1K6/8/8/8/8/6Q1 w - - 0 1")
+    assert tables.probe(board) == (1, 1)
+    assert tables.best_move(board) == ((6, 7), (6, 0))
+    board.push((6, 7), (6, 0))
+    assert tables.probe(board) == (-1, 0)
+    # the same with colours swapped
+    assert tables.probe(Board.from_fen("6q1/8/8/8/8/1k6/8/K7 b - - 0 1")) == (1, 1)
+    # the king on the sixth rank in front of its pawn wins whoever moves, but a rook's pawn can't be forced home
+    assert tables.probe(Board.from_fen("4k3/8/4K3/4P3/8/8/8/8 w - - 0 1")) == (1, 21)
+    result, plies = tables.probe(Board.from_fen("4k3/8/4K3/4P3/8/8/8/8 b - - 0 1"))
+    assert result == -1 and plies > 10
+    assert tables.probe(Board.from_fen("k7/8/8/8/8/8/P7/K7 w - - 0 1")) == (0, 0)
+    # not in the tables
+    assert tables.probe(Board()) is None
+    assert tables.probe(Board.from_fen("4k3/8/8/8/8/8/8/4K2R w K - 0 1")) is None
+    assert tables.best_move(Board()) is None
+    assert best_move(Board.from_fen("k7/8/1K6/8/8/8/8/6Q1 w - - 0 1"), Colour.WHITE, 0, tablebase=tables) == \
+        ((6, 7), (6, 0))
+
+
+def test_best_play_mates_on_time(tables):
+    # both sides follow the tables, and the mate comes exactly when the first probe said
+    for fen in ["8/8/8/4k3/8/8/8/R3K3 w - - 0 1", "4k3/8/4K3/4P3/8/8/8/8 b - - 0 1",
+                "7k/8/8/8/8/8/q7/7K b - - 0 1"]:
+        board = Board.from_fen(fen)
+        result, plies = tables.probe(board)
+        assert result != 0
+        for ply in range(plies):
+            board.push(*tables.best_move(board))
+        assert board.game_status(board.turn) == GameStatus.CHECKMATE
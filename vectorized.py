@@ -0,0 +1,262 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from board_and_pieces import (BLACK_KINGSIDE, BLACK_QUEENSIDE, DIAGONAL, DIRECTIONS, FULL_BOARD, KING_ATTACKS,
+                              KING_OFFSETS, KNIGHT_ATTACKS, KNIGHT_OFFSETS, ORTHOGONAL, RANK_MASKS, WHITE_KINGSIDE,
+                              WHITE_QUEENSIDE, Colour)
+
+# Move generation for a whole batch of positions at once. Every array below has one row per position, and each
+# step is a handful of NumPy operations over all the rows, so the interpreter's cost is paid per batch rather than
+# per position. Bitboards use the same bit x + 8*y layout as Board.
+
+FULL = np.uint64(FULL_BOARD)
+ZERO = np.uint64(0)
+ONE = np.uint64(1)
+LAST_RANKS = np.uint64(RANK_MASKS[0] | RANK_MASKS[7])
+KNIGHT_TABLE = np.array(KNIGHT_ATTACKS, dtype=np.uint64)
+KING_TABLE = np.array(KING_ATTACKS, dtype=np.uint64)
+# (bits that must be empty, bits that mustn't be attacked, right) for each castle, by colour
+CASTLES = {True: [(0b1110 << 56, 0b11100 << 56, WHITE_QUEENSIDE), (0b1100000 << 56, 0b1110000 << 56, WHITE_KINGSIDE)],
+           False: [(0b1110, 0b11100, BLACK_QUEENSIDE), (0b1100000, 0b1110000, BLACK_KINGSIDE)]}
+
+
+def _file_mask(dx: int) -> np.uint64:
+    # squares a step dx files sideways can land on without wrapping round the board
+    mask = 0
+    for x in range(max(0, dx), min(8, 8 + dx)):
+        mask |= 0x0101010101010101 << x
+    return np.uint64(mask)
+
+
+def _shift(bits, distance: int):
+    return bits << np.uint64(distance) if distance > 0 else bits >> np.uint64(-distance)
+
+
+# (bit index distance, landing mask) for one step in each of DIRECTIONS
+STEPS = [(x_inc + 8 * y_inc, _file_mask(x_inc)) for x_inc, y_inc in DIRECTIONS]
+
+
+def _offset_attacks(bits, offsets):
+    # squares reached from every bit in bits by one of offsets, as for knights, kings and pawns
+    attacks = np.zeros_like(bits)
+    for x_inc, y_inc in offsets:
+        attacks |= _shift(bits, x_inc + 8 * y_inc) & _file_mask(x_inc)
+    return attacks
+
+
+def _slide(bits, empty, direction: int):
+    # squares attacked from every bit in bits along one direction, up to and including the first piece in the way,
+    # by Kogge-Stone fill
+    distance, mask = STEPS[direction]
+    propagate = empty & mask
+    bits = bits | (propagate & _shift(bits, distance))
+    propagate = propagate & _shift(propagate, distance)
+    bits = bits | (propagate & _shift(bits, 2 * distance))
+    propagate = propagate & _shift(propagate, 2 * distance)
+    bits = bits | (propagate & _shift(bits, 4 * distance))
+    return _shift(bits, distance) & mask
+
+
+def _slides(bits, empty, directions):
+    attacks = np.zeros_like(bits)
+    for direction in directions:
+        attacks |= _slide(bits, empty, direction)
+    return attacks
+
+
+def _pawn_attacks(pawns, white):
+    return np.where(white, _offset_attacks(pawns, [(1, -1), (-1, -1)]), _offset_attacks(pawns, [(1, 1), (-1, 1)]))
+
+
+def _square(bits):
+    # bit index of a single set bit; 2**n converts to float exactly, and frexp reads n straight off the exponent
+    return (np.frexp(np.maximum(bits, ONE).astype(np.float64))[1] - 1).astype(np.intp)
+
+
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:
+    _BYTE_COUNTS = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+    def popcount(bits):
+        bits = np.ascontiguousarray(bits, dtype=np.uint64)
+        return _BYTE_COUNTS[bits.view(np.uint8).reshape(bits.shape + (8,))].sum(axis=-1, dtype=np.uint64)
+
+
+class Positions(NamedTuple):
+    # bitboards[i] is board i's Board.bitboards, white[i] whether white is to move, castling[i] its KQkq flags and
+    # en_passant[i] its en passant file or -1
+    bitboards: np.ndarray
+    white: np.ndarray
+    castling: np.ndarray
+    en_passant: np.ndarray
+
+
+class MoveMasks(NamedTuple):
+    # targets[i, square] holds the squares the piece on bit index square can move to in position i; promotions
+    # are one square for four moves, en passant captures are the square the capturing pawn lands on, and castling
+    # is left to castling[i] = (queenside, kingside)
+    pseudo_legal_targets: np.ndarray
+    legal_targets: np.ndarray
+    castling: np.ndarray
+    in_check: np.ndarray
+    # move counts as Board counts them, so legal_counts[i] == len(board.legal_moves(board.turn))
+    pseudo_legal_counts: np.ndarray
+    legal_counts: np.ndarray
+    # squares attacked by white and by black
+    attacks: np.ndarray
+
+
+def encode(boards) -> Positions:
+    # each Board's own bitboards and state, for the side to move
+    bitboards = np.array([board.bitboards for board in boards], dtype=np.uint64).reshape(-1, 12)
+    white = np.array([board.turn == Colour.WHITE for board in boards], dtype=bool)
+    castling = np.array([board.castling_rights for board in boards], dtype=np.uint8)
+    en_passant = np.array([-1 if board.en_passant_file is None else board.en_passant_file for board in boards],
+                          dtype=np.int8)
+    return Positions(bitboards, white, castling, en_passant)
+
+
+def from_squares(codes, white, castling, en_passant) -> Positions:
+    # codes is an N x 64 array with PieceType.index + 1 for each piece and 0 for an empty square
+    codes = np.asarray(codes)
+    bits = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+    bitboards = np.stack([np.where(codes == index + 1, bits, ZERO).sum(axis=1, dtype=np.uint64)
+                          for index in range(12)], axis=1)
+    return Positions(bitboards, np.asarray(white, dtype=bool), np.asarray(castling, dtype=np.uint8),
+                     np.asarray(en_passant, dtype=np.int8))
+
+
+def from_bytes(data) -> Positions:
+    # data is an N x 33 array of Board.to_bytes encodings
+    data = np.asarray(data, dtype=np.uint8).reshape(-1, 33)
+    codes = np.empty((len(data), 64), dtype=np.uint8)
+    codes[:, 0::2] = data[:, :32] & 15
+    codes[:, 1::2] = data[:, :32] >> 4
+    white = (data[:, 32] & 1) == 0
+    castling = (data[:, 32] >> 1) & 15
+    # the en passant pawn has its own code, and belongs to the side not to move
+    passed = codes == 13
+    en_passant = np.where(passed.any(axis=1), passed.argmax(axis=1) % 8, -1)
+    codes = np.where(passed, np.where(white, 7, 1)[:, None], codes)
+    return from_squares(codes, white, castling, en_passant)
+
+
+def attack_maps(bitboards) -> np.ndarray:
+    # N x 2: the squares white attacks and the squares black attacks
+    bitboards = np.asarray(bitboards, dtype=np.uint64)
+    empty = ~np.bitwise_or.reduce(bitboards, axis=1)
+    maps = []
+    for offset, white in [(0, True), (6, False)]:
+        pieces = [bitboards[:, offset + kind] for kind in range(6)]
+        maps.append(_pawn_attacks(pieces[0], white) | _offset_attacks(pieces[1], KNIGHT_OFFSETS)
+                    | _offset_attacks(pieces[5], KING_OFFSETS)
+                    | _slides(pieces[2] | pieces[4], empty, DIAGONAL) | _slides(pieces[3] | pieces[4], empty, ORTHOGONAL))
+    return np.stack(maps, axis=1)
+
+
+def generate(positions: Positions) -> MoveMasks:
+    bitboards, white, castling, en_passant = positions
+    count = len(bitboards)
+    rows = np.arange(count)
+    # everything from here on is from the side to move's point of view
+    own = [np.where(white, bitboards[:, kind], bitboards[:, kind + 6]) for kind in range(6)]
+    enemy = [np.where(white, bitboards[:, kind + 6], bitboards[:, kind]) for kind in range(6)]
+    own_all = np.bitwise_or.reduce(own)
+    enemy_all = np.bitwise_or.reduce(enemy)
+    occupied = own_all | enemy_all
+    empty = ~occupied
+    king = own[5]
+    enemy_diagonal = enemy[2] | enemy[4]
+    enemy_orthogonal = enemy[3] | enemy[4]
+
+    # squares the opponent attacks, looking through our king so it can't step back along a line it's checked on
+    through_king = empty | king
+    attacked = _pawn_attacks(enemy[0], ~white) | _offset_attacks(enemy[1], KNIGHT_OFFSETS) \
+        | _offset_attacks(enemy[5], KING_OFFSETS) | _slides(enemy_diagonal, through_king, DIAGONAL) \
+        | _slides(enemy_orthogonal, through_king, ORTHOGONAL)
+
+    # pieces giving check, and the squares a move has to land on to answer a single check
+    checkers = (_offset_attacks(king, KNIGHT_OFFSETS) & enemy[1]) | (_pawn_attacks(king, white) & enemy[0])
+    check_rays = np.zeros_like(king)
+    # pinned pieces and the line each one may still move along
+    pins = []
+    for direction in range(8):
+        sliders = enemy_diagonal if direction in DIAGONAL else enemy_orthogonal
+        ray = _slide(king, empty, direction)
+        hit = ray & sliders
+        checkers |= hit
+        check_rays |= np.where(hit != ZERO, ray, ZERO)
+        blocker = ray & own_all
+        beyond = _slide(blocker, empty, direction)
+        pins.append((np.where((beyond & sliders) != ZERO, blocker, ZERO), ray | beyond))
+    checks = popcount(checkers)
+    check_mask = np.where(checks == 0, FULL, np.where(checks == 1, checkers | check_rays, ZERO))
+
+    en_passant_target = np.where(en_passant >= 0, np.left_shift(
+        ONE, (np.where(white, 16, 40) + np.maximum(en_passant, 0)).astype(np.uint64)), ZERO)
+    en_passant_captured = np.where(white, en_passant_target << np.uint64(8), en_passant_target >> np.uint64(8))
+
+    pseudo_legal_targets = np.zeros((count, 64), dtype=np.uint64)
+    legal_targets = np.zeros((count, 64), dtype=np.uint64)
+    pseudo_legal_counts = np.zeros(count, dtype=np.int64)
+    legal_counts = np.zeros(count, dtype=np.int64)
+
+    # every piece but the king, lowest bit first, one piece from each position per pass
+    remaining = own_all & ~king
+    while remaining.any():
+        bit = remaining & (~remaining + ONE)
+        remaining ^= bit
+        square = _square(bit)
+        is_pawn = (own[0] & bit) != ZERO
+        is_knight = (own[1] & bit) != ZERO
+        is_diagonal = ((own[2] | own[4]) & bit) != ZERO
+        is_orthogonal = ((own[3] | own[4]) & bit) != ZERO
+
+        single = np.where(white, bit >> np.uint64(8), bit << np.uint64(8)) & empty
+        double = np.where(white, (single & np.uint64(RANK_MASKS[5])) >> np.uint64(8),
+                          (single & np.uint64(RANK_MASKS[2])) << np.uint64(8)) & empty
+        pawn_captures = _pawn_attacks(bit, white)
+        targets = np.where(is_pawn, single | double | (pawn_captures & enemy_all), ZERO)
+        targets |= np.where(is_knight, KNIGHT_TABLE[square] & ~own_all, ZERO)
+        targets |= np.where(is_diagonal, _slides(bit, empty, DIAGONAL) & ~own_all, ZERO)
+        targets |= np.where(is_orthogonal, _slides(bit, empty, ORTHOGONAL) & ~own_all, ZERO)
+        en_passant_move = np.where(is_pawn, pawn_captures & en_passant_target, ZERO)
+
+        pin_mask = np.full(count, FULL)
+        for pinned, line in pins:
+            pin_mask = np.where((pinned & bit) != ZERO, line, pin_mask)
+        legal = targets & check_mask & pin_mask
+        # en passant takes two pawns off one rank, which no mask describes, so it is checked by playing it
+        after = empty ^ bit ^ en_passant_captured ^ en_passant_target
+        exposed = (_slides(king, after, DIAGONAL) & enemy_diagonal) | (_slides(king, after, ORTHOGONAL) & enemy_orthogonal) \
+            | (_offset_attacks(king, KNIGHT_OFFSETS) & enemy[1]) \
+            | (_pawn_attacks(king, white) & enemy[0] & ~en_passant_captured)
+        legal |= np.where(exposed == ZERO, en_passant_move, ZERO)
+        targets |= en_passant_move
+
+        pawn_rows = np.where(is_pawn, LAST_RANKS, ZERO)
+        pseudo_legal_counts += popcount(targets).astype(np.int64) + 3 * popcount(targets & pawn_rows).astype(np.int64)
+        legal_counts += popcount(legal).astype(np.int64) + 3 * popcount(legal & pawn_rows).astype(np.int64)
+        present = bit != ZERO
+        pseudo_legal_targets[rows[present], square[present]] = targets[present]
+        legal_targets[rows[present], square[present]] = legal[present]
+
+    # the king, which may not step onto an attacked square, and castling
+    square = _square(king)
+    targets = KING_TABLE[square] & ~own_all
+    legal = targets & ~attacked
+    castles = np.zeros((count, 2), dtype=bool)
+    for side in [True, False]:
+        for index, (between, crossed, right) in enumerate(CASTLES[side]):
+            castles[:, index] |= (white == side) & ((castling & right) != 0) \
+                & ((occupied & np.uint64(between)) == ZERO) & ((attacked & np.uint64(crossed)) == ZERO)
+    pseudo_legal_targets[rows, square] = targets
+    legal_targets[rows, square] = legal
+    castle_counts = castles.sum(axis=1)
+    pseudo_legal_counts += popcount(targets).astype(np.int64) + castle_counts
+    legal_counts += popcount(legal).astype(np.int64) + castle_counts
+
+    return MoveMasks(pseudo_legal_targets, legal_targets, castles, checks > 0, pseudo_legal_counts, legal_counts,
+                     attack_maps(bitboards))
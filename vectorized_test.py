@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from board_and_pieces import Board
+from perft import POSITIONS
+
+np = pytest.importorskip("numpy")
+vectorized = pytest.importorskip("vectorized")
+
+
+def sample_boards():
+    # the perft positions and positions from seeded random games, which take in checks, pins, promotions,
+    # en passant and castling
+    boards = [Board.from_fen(fen) for fen, counts in POSITIONS.values()]
+    boards += [Board.from_fen(fen) for fen in ["8/8/8/KPp4r/8/8/8/7k w - c6 0 1",
+                                               "8/8/8/8/k1pP3Q/8/8/4K3 b - d3 0 1",
+                                               "4k3/8/8/2KPp2r/8/8/8/8 w - e6 0 1",
+                                               "4k3/8/8/8/8/8/8/4K2R w K - 0 1"]]
+    rng = random.Random(7)
+    for start in [Board()] + boards[:6]:
+        board = start.deepcopy()
+        for ply in range(60):
+            moves = board.legal_moves(board.turn)
+            if not moves:
+                break
+            board.push(*rng.choice(moves))
+            boards.append(board.deepcopy())
+    return boards
+
+
+def expected(board):
+    targets = [0] * 64
+    castling = [False, False]
+    for piece_location, move_location in board.legal_moves(board.turn):
+        if len(move_location) == 1:
+            castling[move_location[0] == "Kingside"] = True
+        else:
+            x, y = move_location[:2]
+            targets[piece_location[0] + 8 * piece_location[1]] |= 1 << (x + 8 * y)
+    return targets, castling
+
+
+def test_generate_matches_board():
+    boards = sample_boards()
+    masks = vectorized.generate(vectorized.encode(boards))
+    for index, board in enumerate(boards):
+        targets, castling = expected(board)
+        assert [int(bits) for bits in masks.legal_targets[index]] == targets, board.to_fen()
+        assert list(masks.castling[index]) == castling
+        assert masks.legal_counts[index] == len(board.legal_moves(board.turn))
+        assert masks.pseudo_legal_counts[index] == len(board.pseudo_legal_moves(board.turn))
+        assert masks.in_check[index] == board.in_check(board.turn)
+        for square in range(64):
+            assert bool(masks.attacks[index, 0] >> np.uint64(square) & np.uint64(1)) == board._attacked(square, 1)
+            assert bool(masks.attacks[index, 1] >> np.uint64(square) & np.uint64(1)) == board._attacked(square, 2)
+
+
+def test_filter_moves_agrees():
+    boards = sample_boards()[:40]
+    masks = vectorized.generate(vectorized.encode(boards))
+    for index, board in enumerate(boards):
+        for (x, y), piece in board.board_dict.items():
+            if piece.colour != board.turn:
+                continue
+            moves = piece.get_valid_moves(board, board.last_moved, board.initial_pos, board.final_pos)
+            legal = board.filter_moves(moves, (x, y))
+            assert sum({1 << (move[0] + 8 * move[1]) for move in legal if len(move) != 1}) == \
+                masks.legal_targets[index, x + 8 * y]
+
+
+def test_from_bytes():
+    boards = sample_boards()
+    data = np.frombuffer(b"".join(board.to_bytes() for board in boards), dtype=np.uint8).reshape(-1, 33)
+    from_bytes = vectorized.from_bytes(data)
+    encoded = vectorized.encode(boards)
+    for field, other in zip(from_bytes, encoded):
+        assert (field == other).all()